@@ -1,16 +1,17 @@
-from pymongo import MongoClient
-import pandas as pd
-from tqdm import tqdm
-import threading
 import os
+from merge_chunks import merge_chunks
+from range_scan import scan_to_chunks, CASE_INSENSITIVE
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from reddit_db import get_db
 
 # Constants
 NUM_THREADS = 4
 FIELDS_TO_EXPORT = ['_id', 'id', 'created_utc', 'subreddit', 'author', 'title', 'selftext', 'score', 'num_comments']  # Adjust these fields as per your collection structure
 
 # Connect to MongoDB
-client = MongoClient('mongodb://localhost:27017/')
-db = client['reddit']
+db = get_db()
 
 # List of subreddits to filter by, converted to lower case
 intersection = [
@@ -36,48 +37,19 @@ mh_subreddits = [
 # Union of the two sets to remove duplicates and then convert back to list
 subreddit_lst = list(set(intersection).union(mh_subreddits))
 
-# Optional: Convert to lower case for case-insensitive matching
+# The server matches with a case-insensitive collation, so the case here doesn't matter
 subreddit_lst = [sub.lower() for sub in subreddit_lst]
 
 # Directory for storing chunks
 if not os.path.exists('./submissions'):
     os.makedirs('./submissions')
 
-def fetch_and_filter_data(thread_id, collection_name, output_file, fields_to_export):
-    with tqdm(desc=f"Thread-{thread_id}") as pbar:
-        cursor = db[collection_name].find({})
-        for index, document in enumerate(cursor):
-            if index % NUM_THREADS == thread_id:
-                subreddit = document.get('subreddit', '').lower()
-                if subreddit in subreddit_lst:
-                    # Select only the specified fields
-                    filtered_doc = {field: document.get(field, '') for field in fields_to_export}
-                    df = pd.DataFrame([filtered_doc])
-                    df.to_csv(output_file, mode='a', header=False, index=False)
-            pbar.update(1)
-
-# Use multi-threading to fetch data in parallel
-threads = []
-
-for i in range(NUM_THREADS):
-    output_file = f"./submissions/filtered_submissions_{i}.csv"
-
-    # Ensure the file exists and write header for the first file
-    with open(output_file, 'a') as file:
-        if i == 0:
-            sample_doc = db['submissions'].find_one()
-            df_headers = pd.DataFrame([sample_doc])
-            df_headers.to_csv(file, index=False, mode='w')
-    
-    thread = threading.Thread(target=fetch_and_filter_data, args=(i, "submissions", output_file, FIELDS_TO_EXPORT))
-    threads.append(thread)
-    thread.start()
-
-# Wait for all threads to complete
-for thread in threads:
-    thread.join()
+# One pass over the collection: _id ranges are scanned in parallel and the server applies the
+# subreddit filter and projection, so only matching documents are sent back
+chunk_files = scan_to_chunks(
+    db['submissions'], {"subreddit": {"$in": subreddit_lst}}, FIELDS_TO_EXPORT,
+    "./submissions/filtered_submissions", NUM_THREADS, collation=CASE_INSENSITIVE
+)
 
-# Merge all chunk files
-all_files = [f"./submissions/filtered_submissions_{i}.csv" for i in range(NUM_THREADS)]
-df = pd.concat((pd.read_csv(f) for f in all_files), ignore_index=True)
-df.to_csv("filtered_submissions_by_subreddit.csv", index=False)
+# Merge all chunk files (in _id order) into one file with a single header
+merge_chunks(chunk_files, "filtered_submissions_by_subreddit.csv", fields=FIELDS_TO_EXPORT)
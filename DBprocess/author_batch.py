@@ -0,0 +1,60 @@
+import csv
+import os
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from tqdm import tqdm
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from reddit_db import CURSOR_BATCH_SIZE, WRITE_BATCH_SIZE
+
+# Constants
+AUTHOR_BATCH_SIZE = 1000  # Authors per $in query; uses the author index, one round trip per batch instead of per user
+
+def fetch_author_batches(collection, batches, fields, output_file, pbar, pbar_lock):
+    projection = {field: 1 for field in fields}
+    fetched = 0
+    with open(output_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(fields)
+        rows = []
+        for batch in batches:
+            cursor = collection.find({"author": {"$in": batch}}, projection, batch_size=CURSOR_BATCH_SIZE)
+            for document in cursor:
+                rows.append([document.get(field, '') for field in fields])
+                if len(rows) >= WRITE_BATCH_SIZE:
+                    writer.writerows(rows)
+                    fetched += len(rows)
+                    rows = []
+            with pbar_lock:
+                pbar.update(len(batch))
+        writer.writerows(rows)
+        fetched += len(rows)
+    return fetched
+
+def fetch_by_authors(collection, authors, fields, output_prefix, num_threads, batch_size=AUTHOR_BATCH_SIZE):
+    """Write every document by the given authors to one chunk file per thread.
+
+    Authors are sent as $in batches of batch_size, and rows are written as they arrive, so neither
+    a user's documents nor the whole result is ever held in memory. Returns the chunk files.
+    """
+    authors = list(dict.fromkeys(authors))  # Drop repeated names but keep the list order
+    batches = [authors[i:i + batch_size] for i in range(0, len(authors), batch_size)]
+    output_files = [f"{output_prefix}_{i}.csv" for i in range(num_threads)]
+    pbar_lock = threading.Lock()
+    start = time.perf_counter()
+
+    with tqdm(total=len(authors), desc=f"Fetching {collection.name} by author", unit=" users") as pbar, \
+            ThreadPoolExecutor(max_workers=num_threads) as executor:
+        futures = [
+            executor.submit(fetch_author_batches, collection, batches[i::num_threads], fields, output_file, pbar, pbar_lock)
+            for i, output_file in enumerate(output_files)
+        ]
+        fetched = sum(future.result() for future in futures)
+
+    elapsed = time.perf_counter() - start
+    print(f"Fetched {fetched} documents for {len(authors)} authors in {elapsed:.1f}s "
+          f"({fetched / elapsed if elapsed else 0:,.0f} docs/sec)")
+    print(f"{len(batches)} queries instead of {len(authors)} ({len(authors) - len(batches)} round trips saved)")
+    return output_files
@@ -0,0 +1,106 @@
+import os
+import sys
+import csv
+import heapq
+import shutil
+import argparse
+import tempfile
+from tqdm import tqdm
+from merge_chunks import iter_chunk, sort_key_value
+
+# Increase the field size limit
+csv.field_size_limit(sys.maxsize)
+
+# Constants
+MEMORY_BUDGET = 8 * 1024 ** 3  # Approximate bytes of rows held in memory before a run is spilled
+RUN_DIR = "./sort_runs"  # Put this on the SSD; runs take about as much space as the input
+MAX_FAN_IN = 256  # Runs merged at once; more runs are merged in several passes
+ROW_OVERHEAD = 64 * 8  # Rough per-row cost of the Python list and str objects, in bytes
+
+def read_rows(input_files, fields):
+    """Yield rows of all input files in `fields` order (see merge_chunks.iter_chunk for the chunk layouts)."""
+    for input_file in input_files:
+        yield from iter_chunk(input_file, fields, strict=True)
+
+def write_run(rows, key_index, run_dir, run_number):
+    rows.sort(key=lambda row: sort_key_value(row[key_index]))
+    path = os.path.join(run_dir, f"run_{run_number:05d}.csv")
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerows(rows)
+    return path
+
+def iter_run(path):
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        yield from csv.reader(f)
+
+def merge_runs(run_paths, key_index, output_file, header=None):
+    """k-way merge of sorted runs into output_file (with header, if given)."""
+    with open(output_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        if header is not None:
+            writer.writerow(header)
+        merged = heapq.merge(*(iter_run(path) for path in run_paths), key=lambda row: sort_key_value(row[key_index]))
+        writer.writerows(merged)
+
+def external_sort(input_files, output_file, key="created_utc", memory_budget=MEMORY_BUDGET, run_dir=RUN_DIR, fields=None):
+    """Sort one or more CSV files (e.g. per-thread chunk files) by an integer column into output_file.
+
+    Rows are read in runs that fit memory_budget, each run is sorted and spilled to run_dir, and
+    the runs are combined with a k-way merge. Equal keys keep their input order.
+    fields: output header; defaults to the header of the first file. Chunks without a header must
+        hold exactly these columns, and a file whose rows don't fit them stops the sort.
+    """
+    if fields is None:
+        with open(input_files[0], 'r', newline='', encoding='utf-8') as f:
+            fields = next(csv.reader(f))
+    rows = read_rows(input_files, fields)
+    key_index = fields.index(key)
+    os.makedirs(run_dir, exist_ok=True)
+    run_dir = tempfile.mkdtemp(prefix="sort_", dir=run_dir)
+
+    try:
+        run_paths = []
+        run, run_bytes = [], 0
+        for row in tqdm(rows, desc="Reading runs", unit=" rows"):
+            run.append(row)
+            run_bytes += sum(map(len, row)) + ROW_OVERHEAD
+            if run_bytes >= memory_budget:
+                run_paths.append(write_run(run, key_index, run_dir, len(run_paths)))
+                run, run_bytes = [], 0
+        if run or not run_paths:
+            run_paths.append(write_run(run, key_index, run_dir, len(run_paths)))
+
+        # Merge in passes while there are more runs than files we want open at once
+        merge_pass = 0
+        while len(run_paths) > MAX_FAN_IN:
+            next_paths = []
+            for i in range(0, len(run_paths), MAX_FAN_IN):
+                group = run_paths[i:i + MAX_FAN_IN]
+                path = os.path.join(run_dir, f"pass{merge_pass}_{i // MAX_FAN_IN:05d}.csv")
+                merge_runs(group, key_index, path)
+                for used in group:
+                    os.remove(used)
+                next_paths.append(path)
+            run_paths = next_paths
+            merge_pass += 1
+
+        print(f"Merging {len(run_paths)} sorted runs into {output_file}")
+        merge_runs(run_paths, key_index, output_file, fields)
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="External merge sort of CSV files by an integer column")
+    parser.add_argument("output_file")
+    parser.add_argument("input_files", nargs="+", help="One file, or the per-thread chunk files to merge in the same pass")
+    parser.add_argument("--key", default="created_utc")
+    parser.add_argument("--memory-gb", type=float, default=MEMORY_BUDGET / 1024 ** 3)
+    parser.add_argument("--run-dir", default=RUN_DIR)
+    parser.add_argument("--fields", nargs="+", help="Output header (default: header of the first file)")
+    args = parser.parse_args()
+
+    external_sort(args.input_files, args.output_file, args.key, int(args.memory_gb * 1024 ** 3), args.run_dir, args.fields)
+    print(f"File sorted by '{args.key}' and saved to {args.output_file}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import sys
+import csv
+import heapq
+import argparse
+import itertools
+from tqdm import tqdm
+
+# Increase the field size limit
+csv.field_size_limit(sys.maxsize)
+
+def sort_key_value(value):
+    # Rows with an unreadable key go to the end instead of aborting a multi-hour sort
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return int(float(value))
+        except ValueError:
+            return sys.maxsize
+
+def looks_like_header(row, fields):
+    # A first row made of column names (rather than data) names at least one expected field
+    return bool(fields) and any(value in fields for value in row)
+
+def width_error(path, row, expected):
+    return ValueError(f"{path}: row with {len(row)} columns where {expected} were expected; "
+                      f"pass the output columns explicitly (fields / --fields) if the header doesn't match the rows")
+
+def iter_chunk(path, fields, strict=False):
+    """Yield rows of one chunk file in `fields` order.
+
+    The chunk may start with its own header (possibly in another column order, or with extra
+    columns) or have none at all, in which case its rows are taken to be in `fields` order.
+    strict: raise ValueError when the header lacks one of `fields` or a row has the wrong number of
+        columns, instead of filling the gaps with empty strings.
+    """
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        first = next(reader, None)
+        if first is None:
+            return
+        has_header = looks_like_header(first, fields)
+        if not has_header or first == fields:
+            for row in reader if has_header else itertools.chain([first], reader):
+                if strict and len(row) != len(fields):
+                    raise width_error(path, row, len(fields))
+                yield row
+            return
+        missing = [field for field in fields if field not in first]
+        if strict and missing:
+            raise ValueError(f"{path}: header has no column {', '.join(missing)}")
+        positions = [first.index(field) if field in first else None for field in fields]
+        for row in reader:
+            # Headers written from a sample document (DBfilter_bysubreddit_*) name more columns
+            # than the rows carry; such rows already hold exactly `fields`
+            if len(row) == len(fields) != len(first):
+                yield row
+            elif strict and len(row) != len(first):
+                raise width_error(path, row, len(first))
+            else:
+                yield [row[p] if p is not None and p < len(row) else '' for p in positions]
+
+def check_sorted(rows, key_index, path):
+    last = None
+    for row in rows:
+        value = sort_key_value(row[key_index])
+        if last is not None and value < last:
+            raise ValueError(f"{path} is not sorted by column {key_index}; sort it with external_sort.py instead")
+        last = value
+        yield row
+
+def merge_chunks(input_files, output_file, fields=None, order_by=None, dedupe_on=None):
+    """Stream N chunk files into one CSV with a single header.
+
+    fields: output header; defaults to the header of the first file.
+    order_by: column the chunks are each sorted by; they are k-way merged to keep that order.
+    dedupe_on: columns identifying a row (e.g. ["id"]); repeated rows are dropped. Requires order_by,
+        so it runs in constant memory: duplicates share their order_by value and arrive together.
+    """
+    if dedupe_on and not order_by:
+        raise ValueError("dedupe_on needs order_by: without a common order every identity would have to be kept in memory")
+    if fields is None:
+        with open(input_files[0], 'r', newline='', encoding='utf-8') as f:
+            fields = next(csv.reader(f))
+
+    streams = [iter_chunk(path, fields) for path in input_files]
+    if order_by:
+        key_index = fields.index(order_by)
+        streams = [check_sorted(stream, key_index, path) for stream, path in zip(streams, input_files)]
+        rows = heapq.merge(*streams, key=lambda row: sort_key_value(row[key_index]))
+    else:
+        rows = (row for stream in streams for row in stream)
+
+    dedupe_indexes = [fields.index(column) for column in dedupe_on] if dedupe_on else None
+    seen, seen_order_value = set(), None
+    written = duplicates = 0
+
+    with open(output_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(fields)
+        for row in tqdm(rows, desc=f"Merging into {output_file}", unit=" rows"):
+            if dedupe_indexes:
+                identity = tuple(row[i] for i in dedupe_indexes)
+                if any(identity):
+                    order_value = row[key_index]
+                    if order_value != seen_order_value:
+                        seen.clear()
+                        seen_order_value = order_value
+                    if identity in seen:
+                        duplicates += 1
+                        continue
+                    seen.add(identity)
+            writer.writerow(row)
+            written += 1
+
+    print(f"Merged {len(input_files)} files into {output_file}: {written} rows, {duplicates} duplicates dropped")
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge per-thread chunk CSVs into one file")
+    parser.add_argument("output_file")
+    parser.add_argument("input_files", nargs="+")
+    parser.add_argument("--fields", nargs="+", help="Output header (default: header of the first file)")
+    parser.add_argument("--order-by", help="Column each chunk is sorted by, e.g. created_utc")
+    parser.add_argument("--dedupe-on", nargs="+", help="Columns identifying a row, e.g. id (needs --order-by)")
+    args = parser.parse_args()
+    if args.dedupe_on and not args.order_by:
+        parser.error("--dedupe-on needs --order-by")
+
+    merge_chunks(args.input_files, args.output_file, args.fields, args.order_by, args.dedupe_on)
+
+if __name__ == "__main__":
+    main()
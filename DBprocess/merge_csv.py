@@ -1,18 +1,12 @@
-import pandas as pd
+from merge_chunks import merge_chunks
 
 NUM_THREADS = 8
 
 all_files = [f"./comments/filtered_comments_{i}.csv" for i in range(NUM_THREADS)]
 output_file = "filtered_comments.csv"
 
-# Write headers to the output file
-sample_df = pd.read_csv(all_files[0], nrows=0)
-sample_df.to_csv(output_file, index=False)
+# Stream every chunk into one file with a single header, without loading anything into memory.
+# Use sort_csv.py on the chunk files instead when the merged output should be ordered by created_utc.
+merge_chunks(all_files, output_file)
 
-# Append each file to the final CSV without loading the entire dataset into memory
-for filename in all_files:
-    with open(output_file, 'a') as outfile:
-        for line in open(filename, 'r'):
-            outfile.write(line)
-
-print(f"Files merged into {output_file}")
+print(f"Files merged into {output_file}")
\ No newline at end of file
@@ -1,56 +1,100 @@
-from pymongo import MongoClient
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+from collections import defaultdict, Counter
 from tqdm import tqdm
 import logging
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from reddit_db import get_db, CURSOR_BATCH_SIZE, WRITE_BATCH_SIZE
 
 # Setup logging
 logging.basicConfig(filename='migration_log.log', level=logging.INFO, format='%(asctime)s: %(message)s')
 
 # Hyperparameters
-DB_NAME = 'reddit'
 COLLECTION_NAME_FROM = 'filtered_comments_sentiment'  # Change as needed
 COLLECTION_NAME_TO = 'filtered_comments_standard'  # Change as needed
 COLLECTION_TYPE = 'C'  # 'S' for submissions or 'C' for comments
+UNMATCHED_SUFFIX = '_unmatched'  # Side collection for ambiguous and missing matches
+
+# Score fields copied for each collection type
+SCORE_FIELDS = {
+    'S': ['sentiment_score_complex', 'sentiment_score_text', 'sentiment_score_title'],  # Submissions
+    'C': ['sentiment_score'],  # Comments
+}
+MATCH_KEY = ['created_utc', 'author']
 
 # MongoDB setup
-client = MongoClient()
-db = client[DB_NAME]
+db = get_db()
+
+def match_key(doc):
+    return tuple(doc.get(field) for field in MATCH_KEY)
+
+def transfer_batch(batch, collection_to, unmatched, score_fields, counts):
+    """Match one batch of source documents with a single query and write the scores in one bulk_write."""
+    targets = defaultdict(list)
+    query = {field: {'$in': list({doc.get(field) for doc in batch})} for field in MATCH_KEY}
+    # The $in lists cover every combination of the two fields; keep only the exact pairs
+    for target in collection_to.find(query, {field: 1 for field in MATCH_KEY}):
+        targets[match_key(target)].append(target['_id'])
+
+    updates, side_docs = [], []
+    for doc in batch:
+        target_ids = targets.get(match_key(doc), [])
+        if len(target_ids) == 1:
+            update = {'$set': {field: doc.get(field, None) for field in score_fields}}
+            updates.append(UpdateOne({'_id': target_ids[0]}, update))
+        else:
+            side_docs.append({
+                'source_id': doc['_id'],
+                **{field: doc.get(field) for field in MATCH_KEY},
+                'reason': 'ambiguous' if target_ids else 'missing',
+                'target_ids': target_ids,
+            })
+
+    if updates:
+        try:
+            counts['updated'] += collection_to.bulk_write(updates, ordered=False).matched_count
+        except BulkWriteError as e:
+            counts['updated'] += e.details.get('nMatched', 0)
+            logging.warning(f"{len(e.details.get('writeErrors', []))} write errors in batch")
+    if side_docs:
+        unmatched.insert_many(side_docs, ordered=False)
+        counts.update(side_doc['reason'] for side_doc in side_docs)
 
 def transfer_sentiment_scores(collection_name_from, collection_name_to, collection_type):
+    if collection_type not in SCORE_FIELDS:
+        raise ValueError("Invalid collection type. Use 'S' for submissions or 'C' for comments.")
+    score_fields = SCORE_FIELDS[collection_type]
+
     collection_from = db[collection_name_from]
     collection_to = db[collection_name_to]
+    unmatched = db[collection_name_to + UNMATCHED_SUFFIX]
+    unmatched.drop()  # Rerunning is safe: the $set updates are idempotent, and the side collection is rebuilt
 
-    for doc in tqdm(collection_from.find(), desc="Processing documents"):
-        query = {
-            'created_utc': doc['created_utc'],
-            'author': doc['author']
-        }
-
-        # Construct update object based on collection type
-        if collection_type == 'S':  # Submissions
-            update = {
-                '$set': {
-                    'sentiment_score_complex': doc.get('sentiment_score_complex', None),
-                    'sentiment_score_text': doc.get('sentiment_score_text', None),
-                    'sentiment_score_title': doc.get('sentiment_score_title', None)
-                }
-            }
-        elif collection_type == 'C':  # Comments
-            update = {
-                '$set': {
-                    'sentiment_score': doc.get('sentiment_score', None)
-                }
-            }
-        else:
-            raise ValueError("Invalid collection type. Use 'S' for submissions or 'C' for comments.")
-
-        # Update the document in the target collection
-        matches = collection_to.count_documents(query)
-        if matches == 1:
-            collection_to.update_one(query, update)
-        elif matches > 1:
-            logging.warning(f"Multiple matches found for document with _id: {doc['_id']}")
-        else:
-            logging.info(f"No match found for document with _id: {doc['_id']}")
+    # Without this index every lookup on the target is a collection scan
+    collection_to.create_index([(field, ASCENDING) for field in MATCH_KEY])
+
+    projection = {field: 1 for field in MATCH_KEY + score_fields}
+    counts = Counter()
+    batch = []
+    cursor = collection_from.find({}, projection, batch_size=CURSOR_BATCH_SIZE)
+    total = collection_from.estimated_document_count()
+    for doc in tqdm(cursor, total=total, desc="Processing documents"):
+        batch.append(doc)
+        # Source documents matched per target query and bulk_write
+        if len(batch) >= WRITE_BATCH_SIZE:
+            transfer_batch(batch, collection_to, unmatched, score_fields, counts)
+            batch = []
+    if batch:
+        transfer_batch(batch, collection_to, unmatched, score_fields, counts)
+
+    summary = (f"Updated {counts['updated']} documents in {collection_name_to}; "
+               f"{counts['ambiguous']} ambiguous and {counts['missing']} missing matches "
+               f"written to {unmatched.name}")
+    logging.info(summary)
+    print(summary)
 
 # Execute the function
 transfer_sentiment_scores(COLLECTION_NAME_FROM, COLLECTION_NAME_TO, COLLECTION_TYPE)
@@ -0,0 +1,81 @@
+import csv
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pymongo.collation import Collation
+from tqdm import tqdm
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from reddit_db import CURSOR_BATCH_SIZE, WRITE_BATCH_SIZE
+
+# Constants
+RANGES_PER_THREAD = 8  # More ranges than threads, so a slow range doesn't leave the other threads idle
+SAMPLE_SIZE = 2000  # _id values sampled to place the range boundaries
+
+# Matches subreddit names regardless of case on the server ("SuicideWatch" == "suicidewatch")
+CASE_INSENSITIVE = Collation(locale="en", strength=2)
+
+def id_ranges(collection, num_ranges):
+    """Split the collection into roughly equal _id ranges using a random sample of _ids."""
+    sample = [doc["_id"] for doc in collection.aggregate([{"$sample": {"size": SAMPLE_SIZE}}, {"$project": {"_id": 1}}])]
+    sample.sort()
+    if not sample:
+        return [(None, None)]
+    step = len(sample) / num_ranges
+    bounds = sorted({sample[int(step * i)] for i in range(1, num_ranges)})
+    lows = [None] + bounds
+    highs = bounds + [None]
+    return list(zip(lows, highs))
+
+def range_query(query, low, high):
+    id_bounds = {}
+    if low is not None:
+        id_bounds["$gte"] = low
+    if high is not None:
+        id_bounds["$lt"] = high
+    return {**query, "_id": id_bounds} if id_bounds else dict(query)
+
+def scan_range(collection, query, fields, output_file, collation, pbar, pbar_lock):
+    projection = {field: 1 for field in fields}
+    cursor = collection.find(query, projection, collation=collation, batch_size=CURSOR_BATCH_SIZE)
+    matched = 0
+    with open(output_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(fields)
+        rows = []
+        for document in cursor:
+            rows.append([document.get(field, '') for field in fields])
+            if len(rows) >= WRITE_BATCH_SIZE:
+                writer.writerows(rows)
+                with pbar_lock:
+                    pbar.update(len(rows))
+                matched += len(rows)
+                rows = []
+        writer.writerows(rows)
+        with pbar_lock:
+            pbar.update(len(rows))
+        matched += len(rows)
+    return matched
+
+def scan_to_chunks(collection, query, fields, output_prefix, num_threads, collation=None):
+    """Run `query` over the collection as parallel _id-range scans, one chunk file per range.
+
+    The filter and projection are evaluated by the server, so only matching documents and the
+    requested fields cross the wire, and every document is read once. Returns the chunk files in
+    _id order; merge them with merge_chunks.
+    """
+    ranges = id_ranges(collection, num_threads * RANGES_PER_THREAD)
+    output_files = [f"{output_prefix}_{i}.csv" for i in range(len(ranges))]
+    pbar_lock = threading.Lock()
+
+    with tqdm(desc=f"Scanning {collection.name} in {len(ranges)} ranges", unit=" docs") as pbar, \
+            ThreadPoolExecutor(max_workers=num_threads) as executor:
+        futures = [
+            executor.submit(scan_range, collection, range_query(query, low, high), fields, output_file, collation, pbar, pbar_lock)
+            for (low, high), output_file in zip(ranges, output_files)
+        ]
+        matched = sum(future.result() for future in futures)
+
+    print(f"Matched {matched} documents in {collection.name}")
+    return output_files
@@ -1,16 +1,21 @@
-import pandas as pd
+import sys
+from external_sort import external_sort
 
 # File paths
-input_file = "filtered_comments.csv"
+input_files = ["filtered_comments.csv"]
 output_file = "sorted_filtered_comments.csv"
 
-# Load the CSV into a DataFrame
-df = pd.read_csv(input_file)
+# The per-thread chunk files can be passed instead, e.g.
+#   python sort_csv.py ./comments/filtered_comments_*.csv
+# which sorts and merges them in one pass without running merge_csv.py first
+if len(sys.argv) > 1:
+    input_files = sys.argv[1:]
 
-# Sort the DataFrame by the 'created_utc' column
-df_sorted = df.sort_values(by='created_utc')
+# Output columns; None takes the header of the first file. Set this to the exported fields when the
+# first chunk starts with a sample-document header that names more columns than its rows hold
+FIELDS = None
 
-# Save the sorted DataFrame back to CSV
-df_sorted.to_csv(output_file, index=False)
+# Sort by 'created_utc' with bounded memory: sorted runs are spilled to disk and merged
+external_sort(input_files, output_file, key='created_utc', fields=FIELDS)
 
-print(f"File sorted by 'created_utc' and saved to {output_file}")
+print(f"File sorted by 'created_utc' and saved to {output_file}")
\ No newline at end of file
@@ -1,32 +1,20 @@
-import csv
 import sys
-from tqdm import tqdm
+from external_sort import external_sort
 
-# Increase the field size limit
-csv.field_size_limit(sys.maxsize)
-
-input_file = "filtered_submissions.csv"
+# File paths
+input_files = ["filtered_submissions.csv"]
 output_file = "sorted_filtered_submissions.csv"
 
-# Function to get the 'created_utc' column value for sorting
-def get_utc(row):
-    return int(row[1])  # Assuming 'created_utc' is the second column
-
-rows = []
-
-with open(input_file, 'r') as f:
-    reader = csv.reader(f)
-    headers = next(reader)  # Read the header
-    for row in tqdm(reader, desc="Reading rows", unit="rows"):
-        rows.append(row)
+# The per-thread chunk files can be passed instead, e.g.
+#   python sort_csv_2.py ./submissions/filtered_submissions_*.csv
+if len(sys.argv) > 1:
+    input_files = sys.argv[1:]
 
-# Sort the rows by 'created_utc' column
-rows.sort(key=get_utc)
+# Output columns; None takes the header of the first file. Set this to the exported fields when the
+# first chunk starts with a sample-document header that names more columns than its rows hold
+FIELDS = None
 
-# Write the sorted rows to the output file
-with open(output_file, 'w', newline='') as f:
-    writer = csv.writer(f)
-    writer.writerow(headers)
-    writer.writerows(rows)
+# Sort by 'created_utc' with bounded memory: sorted runs are spilled to disk and merged
+external_sort(input_files, output_file, key='created_utc', fields=FIELDS)
 
-print(f"File sorted by 'created_utc' and saved to {output_file}")
+print(f"File sorted by 'created_utc' and saved to {output_file}")
\ No newline at end of file
@@ -1,9 +1,12 @@
-import pymongo
 import csv
 from tqdm import tqdm
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from reddit_db import get_db
 
 ### Hyperparameters and Configurations ###
-DB_NAME = "reddit"
 INPUT_FILE = "./integrated/top500_scores.csv"  # CSV file containing 'rank' and 'author'
 OUTPUT_FILE = "./integrated/top500_scores.csv"
 
@@ -12,8 +15,7 @@ FULL_REDDIT_COMMENTS = "filtered_comments_standard"
 FULL_REDDIT_SUBMISSIONS = "filtered_submissions_standard"
 
 # Establish connection
-client = pymongo.MongoClient()
-db = client[DB_NAME]
+db = get_db()
 
 # Read the input CSV file to get the list of users
 with open(INPUT_FILE, 'r') as file:
@@ -0,0 +1,135 @@
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from reddit_db import get_db
+from db_indexes import prepare_stage
+
+# Hyperparameters
+COLLECTIONS = ['relevant_comments', 'relevant_submissions']
+USER_GROUPS_COLLECTION = 'user_groups'
+AUTHOR_BATCH_SIZE = 1000  # Authors per update_many when re-tagging users whose group changed
+
+# Subreddit groups (same lists as group_subreddit.txt)
+SW = ['SuicideWatch']
+MH_SUBREDDITS = [
+    "depression", "mentalhealth", "traumatoolbox", "BipolarReddit",
+    "BPD", "ptsd", "psychoticreddit", "EatingDisorders", "StopSelfHarm",
+    "survivorsofabuse", "rapecounseling", "hardshipmates",
+    "panicparty", "socialanxiety"
+]
+
+# User group precedence, lowest first: a user who posted in SW once is SW, else MH, else Otr
+GROUPS = ['Otr', 'MH', 'SW']
+
+SUBREDDIT_GRP = {
+    "$switch": {
+        "branches": [
+            {"case": {"$in": ["$subreddit", MH_SUBREDDITS]}, "then": "MH"},
+            {"case": {"$in": ["$subreddit", SW]}, "then": "SW"},
+        ],
+        "default": "Otr"
+    }
+}
+
+# Only documents from loads since the last run lack the tags
+UNTAGGED_SUBREDDIT = {"subreddit_grp": {"$exists": False}}
+UNTAGGED_USER = {"user_grp": {"$exists": False}}
+
+def tag_subreddit_groups(db, collection_name):
+    """Add subreddit_grp to documents that don't have it yet."""
+    collection = db[collection_name]
+    count = collection.count_documents(UNTAGGED_SUBREDDIT)
+    if count:
+        collection.aggregate([
+            {"$match": UNTAGGED_SUBREDDIT},
+            {"$project": {"subreddit_grp": SUBREDDIT_GRP}},
+            {"$merge": {"into": collection_name, "on": "_id", "whenMatched": "merge", "whenNotMatched": "discard"}},
+        ], allowDiskUse=True)
+    print(f"{collection_name}: tagged subreddit_grp on {count} new documents")
+
+def update_user_groups(db, collection_names):
+    """Fold the untagged documents into user_groups; users whose group goes up are flagged changed."""
+    new_docs = [{"$match": UNTAGGED_USER}, {"$project": {"author": 1, "subreddit_grp": 1}}]
+    pipeline = list(new_docs)
+    for other in collection_names[1:]:
+        pipeline.append({"$unionWith": {"coll": other, "pipeline": new_docs}})
+    pipeline += [
+        {"$group": {"_id": "$author", "subreddits": {"$addToSet": "$subreddit_grp"}}},
+        {"$project": {"user_grp": {
+            "$cond": [{"$in": ["SW", "$subreddits"]}, "SW",
+                      {"$cond": [{"$in": ["MH", "$subreddits"]}, "MH", "Otr"]}]
+        }}},
+        {"$merge": {
+            "into": USER_GROUPS_COLLECTION,
+            "on": "_id",
+            # Keep the higher of the stored and the new group, and flag the user if it went up
+            "whenMatched": [
+                {"$set": {"raised": {"$gt": [{"$indexOfArray": [GROUPS, "$$new.user_grp"]},
+                                             {"$indexOfArray": [GROUPS, "$user_grp"]}]}}},
+                {"$set": {
+                    "user_grp": {"$cond": ["$raised", "$$new.user_grp", "$user_grp"]},
+                    "changed": {"$or": ["$raised", {"$eq": ["$changed", True]}]},
+                }},
+                {"$unset": "raised"},
+            ],
+            "whenNotMatched": "insert",
+        }},
+    ]
+    db[collection_names[0]].aggregate(pipeline, allowDiskUse=True)
+    db[USER_GROUPS_COLLECTION].create_index("user_grp")
+
+def tag_new_documents(db, collection_name):
+    """Copy user_grp (and user_info, as grp_user.txt did) onto documents that don't have it yet."""
+    collection = db[collection_name]
+    count = collection.count_documents(UNTAGGED_USER)
+    if count:
+        collection.aggregate([
+            {"$match": UNTAGGED_USER},
+            {"$lookup": {"from": USER_GROUPS_COLLECTION, "localField": "author", "foreignField": "_id", "as": "user_info"}},
+            {"$unwind": "$user_info"},
+            {"$project": {
+                "user_grp": "$user_info.user_grp",
+                "user_info": {"_id": "$user_info._id", "user_grp": "$user_info.user_grp"},
+            }},
+            {"$merge": {"into": collection_name, "on": "_id", "whenMatched": "merge", "whenNotMatched": "discard"}},
+        ], allowDiskUse=True)
+    print(f"{collection_name}: tagged user_grp on {count} new documents")
+
+def retag_changed_users(db, collection_names):
+    """Update the older documents of users whose group went up, then clear their changed flag."""
+    user_groups = db[USER_GROUPS_COLLECTION]
+    changed = list(user_groups.find({"changed": True}, {"user_grp": 1}))
+    updated = 0
+    for i in range(0, len(changed), AUTHOR_BATCH_SIZE):
+        batch = changed[i:i + AUTHOR_BATCH_SIZE]
+        for group in GROUPS:
+            authors = [user["_id"] for user in batch if user["user_grp"] == group]
+            if not authors:
+                continue
+            for collection_name in collection_names:
+                result = db[collection_name].update_many(
+                    {"author": {"$in": authors}, "user_grp": {"$ne": group}},
+                    {"$set": {"user_grp": group, "user_info.user_grp": group}},
+                )
+                updated += result.modified_count
+        user_groups.update_many({"_id": {"$in": [user["_id"] for user in batch]}}, {"$unset": {"changed": ""}})
+    print(f"{len(changed)} users changed group; re-tagged {updated} of their older documents")
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally tag subreddit_grp and user_grp after a load")
+    parser.add_argument("collections", nargs="*", default=COLLECTIONS)
+    args = parser.parse_args()
+
+    db = get_db()
+    prepare_stage(db, 'groups')
+    for collection_name in args.collections:
+        tag_subreddit_groups(db, collection_name)
+    update_user_groups(db, args.collections)
+    for collection_name in args.collections:
+        tag_new_documents(db, collection_name)
+    retag_changed_users(db, args.collections)
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,16 @@
-import pymongo
 from datetime import datetime
 from tqdm import tqdm
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from reddit_db import get_db
 
 # MongoDB Connection Parameters
-DB_NAME = "reddit"              # Replace with your database name
 COLLECTION_NAME = "relevant_comments"    # Replace with your collection name
 
 # Connect to MongoDB
-client = pymongo.MongoClient()
-db = client[DB_NAME]
+db = get_db()
 collection = db[COLLECTION_NAME]
 
 def add_created_day_field():
@@ -1,15 +1,16 @@
-from pymongo import MongoClient
 from datetime import datetime
 from tqdm import tqdm
+import os
+import sys
 
-client = MongoClient()  # Connect to MongoDB
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from reddit_db import get_db
 
 # Hyperparameters
-DB_NAME = 'reddit'  # Your database name
 COMMENTS_COLLECTION_NAME = 'relevant_comments'  # Your comments collection name
 SUBMISSIONS_COLLECTION_NAME = 'relevant_submissions'  # Your submissions collection name
 
-db = client[DB_NAME]  # Connect to the database
+db = get_db()  # Connect to the database
 
 def add_month_field(collection_name):
     collection = db[collection_name]
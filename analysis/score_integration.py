@@ -1,14 +1,19 @@
 import csv
 import numpy as np
-from pymongo import MongoClient
 from collections import defaultdict
 from tqdm import tqdm
 import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from reddit_db import get_db, close_client
+from author_sampling import sample_fraction, sample_filter, sample_suffix, ensure_author_buckets, estimate_count, estimate_mean, save_estimates
 
 ### Hyperparameters and Configurations ###
-DB_NAME = "reddit"
 OUTPUT_DIR = "./integrated/"
-OUTPUT_FILE = OUTPUT_DIR + "top500_scores.csv"
+SAMPLE_FRACTION = sample_fraction()  # Fraction of authors integrated; set SAMPLE_FRACTION=0.01 for a quick run
+OUTPUT_FILE = OUTPUT_DIR + f"top500_scores{sample_suffix(SAMPLE_FRACTION)}.csv"
+ESTIMATES_FILE = OUTPUT_FILE.replace(".csv", "_estimates.csv")
 ORDER = "descending"  # Can be "ascending" or "descending"
 NORMALIZE = True  # Set to False if scores are already normalized
 TOP_N = 500  # Number of top/low users to retrieve
@@ -33,8 +38,8 @@ COLLECTION_SUBMISSIONS = "filtered_submissions_sentiment"
 COLLECTION_COMMENTS = "filtered_comments_sentiment"
 
 # MongoDB Connection
-client = MongoClient()
-db = client[DB_NAME]
+db = get_db()
+ensure_author_buckets(db, [COLLECTION_SUBMISSIONS, COLLECTION_COMMENTS], SAMPLE_FRACTION)
 
 # Define normalization ranges and weights for integration
 norm_ranges = {
@@ -80,8 +85,11 @@ def process_documents(collection_name, score_fields, weight):
     collection = db[collection_name]
     last_id = None
     while True:
-        query = {'_id': {'$gt': last_id}} if last_id else {}
-        cursor = collection.find(query).limit(BATCH_SIZE)
+        query = dict(sample_filter(SAMPLE_FRACTION))
+        if last_id:
+            query['_id'] = {'$gt': last_id}
+        # Sorted, so paging by _id holds whichever index the planner picks for the sample filter
+        cursor = collection.find(query).sort('_id', 1).limit(BATCH_SIZE)
         batch_docs = list(cursor)
 
         # Process current batch
@@ -131,7 +139,14 @@ with open(OUTPUT_FILE, "w", newline="") as csvfile:
     for rank, (user, score) in enumerate(sorted_users, start=1):
         writer.writerow([rank, user, score])
 
+# Population estimates (exact for a full run, scaled up with standard errors for a sampled one)
+integrated = list(users_integrated_scores.values())
+save_estimates(ESTIMATES_FILE, [
+    ("users", estimate_count(len(integrated), SAMPLE_FRACTION), len(integrated)),
+    ("mean integrated score", estimate_mean(integrated, SAMPLE_FRACTION), len(integrated)),
+], SAMPLE_FRACTION)
+
 # Close MongoDB connection
-client.close()
+close_client()
 
 print(f"Finished generating {OUTPUT_FILE}.")
@@ -0,0 +1,108 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pymongo.errors import BulkWriteError
+from tqdm import tqdm
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from reddit_db import get_db, CURSOR_BATCH_SIZE, WRITE_BATCH_SIZE
+
+# Hyperparameters (the "for practical use" sizes of stat_sampling.txt)
+SAMPLE_SIZES = {'SW': 150000, 'MH': 200000, 'Otr': 350000}
+SEED = 42
+USER_SOURCE = 'relevant_submissions'  # Users are drawn from the authors of this collection, per user_grp
+COPIES = {'relevant_submissions': 'stat_submissions', 'relevant_comments': 'stat_comments'}
+MANIFEST_FILE = 'stat_sample_manifest.json'
+AUTHOR_BATCH_SIZE = 1000  # Authors per $in read
+NUM_WORKERS = 4  # Author batches copied at once
+
+def group_authors(db, user_grp):
+    pipeline = [{"$match": {"user_grp": user_grp}}, {"$group": {"_id": "$author"}}]
+    # Sorted, so the same seed draws the same users from the same population
+    return sorted(doc["_id"] for doc in db[USER_SOURCE].aggregate(pipeline, allowDiskUse=True))
+
+def draw_sample(db, sizes, seed):
+    """Seeded sample of authors per user_grp; each group gets its own generator so sizes don't interact."""
+    sample = {}
+    for user_grp, size in sizes.items():
+        population = group_authors(db, user_grp)
+        rng = random.Random(f"{seed}-{user_grp}")
+        sample[user_grp] = sorted(rng.sample(population, min(size, len(population))))
+        print(f"{user_grp}: sampled {len(sample[user_grp])} of {len(population)} users")
+    return sample
+
+def save_manifest(path, manifest):
+    tmp_file = path + ".tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_file, path)
+
+def copy_batch(source, target, authors):
+    copied = 0
+    batch = []
+    for doc in source.find({"author": {"$in": authors}}, batch_size=CURSOR_BATCH_SIZE):
+        batch.append(doc)
+        if len(batch) >= WRITE_BATCH_SIZE:
+            copied += insert_batch(target, batch)
+            batch = []
+    if batch:
+        copied += insert_batch(target, batch)
+    return copied
+
+def insert_batch(target, docs):
+    try:
+        return len(target.insert_many(docs, ordered=False).inserted_ids)
+    except BulkWriteError as e:
+        # Unordered: a duplicate _id skips that document, the rest of the batch is still inserted
+        return e.details.get("nInserted", 0)
+
+def copy_documents(db, authors, source_name, target_name):
+    source, target = db[source_name], db[target_name]
+    batches = [authors[i:i + AUTHOR_BATCH_SIZE] for i in range(0, len(authors), AUTHOR_BATCH_SIZE)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=NUM_WORKERS) as executor, \
+            tqdm(total=len(authors), desc=f"{source_name} -> {target_name}", unit=" users") as pbar:
+        copied = 0
+        for batch, count in zip(batches, executor.map(lambda batch: copy_batch(source, target, batch), batches)):
+            copied += count
+            pbar.update(len(batch))
+    elapsed = time.perf_counter() - start
+    print(f"Copied {copied} documents into {target_name} in {elapsed:.1f}s ({len(batches)} queries for {len(authors)} users)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the stat_* collections from a seeded stratified sample of users")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--manifest", default=MANIFEST_FILE)
+    parser.add_argument("--from-manifest", action="store_true", help="Rebuild from the users recorded in the manifest instead of sampling")
+    args = parser.parse_args()
+
+    db = get_db()
+    if args.from_manifest:
+        with open(args.manifest, 'r') as f:
+            manifest = json.load(f)
+        print(f"Rebuilding from {args.manifest} (seed {manifest['seed']}, sampled {manifest['created']})")
+    else:
+        manifest = {
+            "seed": args.seed,
+            "created": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            "user_source": USER_SOURCE,
+            "sizes": SAMPLE_SIZES,
+            "copies": COPIES,
+            "users": draw_sample(db, SAMPLE_SIZES, args.seed),
+        }
+        save_manifest(args.manifest, manifest)
+        print(f"Sample manifest written to {args.manifest}")
+
+    authors = sorted(author for users in manifest["users"].values() for author in users)
+    for source_name, target_name in manifest["copies"].items():
+        db[target_name].drop()
+        copy_documents(db, authors, source_name, target_name)
+        db[target_name].create_index("author")
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,19 @@
-import pymongo
 import csv
 import matplotlib.pyplot as plt
 import os
 from collections import defaultdict
 from tqdm import tqdm
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from reddit_db import get_db
+from author_sampling import sample_fraction, sample_filter, sample_suffix, ensure_author_buckets, estimate_count, estimate_mean, save_estimates
 
 ### Hyperparameters and Configurations ###
-DB_NAME = "reddit"
 OUTPUT_DIR = "./step1/"
 BATCH_SIZE = 100  # Adjustable batch size for data processing
+SAMPLE_FRACTION = sample_fraction()  # Fraction of authors analyzed; set SAMPLE_FRACTION=0.01 for a quick run
+SUFFIX = sample_suffix(SAMPLE_FRACTION)
 
 # Collection names
 COLLECTION_SUBMISSIONS = "filtered_submissions_sentiment"
@@ -19,13 +24,13 @@ if not os.path.exists(OUTPUT_DIR):
     os.makedirs(OUTPUT_DIR)
 
 # MongoDB connection
-client = pymongo.MongoClient()
-db = client[DB_NAME]
+db = get_db()
+ensure_author_buckets(db, [COLLECTION_SUBMISSIONS, COLLECTION_COMMENTS], SAMPLE_FRACTION)
 
 # Function to process data from MongoDB
 def process_data(collection, score_field, desc):
     pipeline = [
-        {"$match": {"author": {"$ne": "[deleted]"}}},
+        {"$match": {"author": {"$ne": "[deleted]"}, **sample_filter(SAMPLE_FRACTION)}},
         {"$project": {"author": 1, score_field: 1, "subreddit_grp": 1, "user_grp": 1}},
         {"$group": {
             "_id": {"author": "$author", "subreddit_grp": "$subreddit_grp", "user_grp": "$user_grp"},
@@ -61,9 +66,10 @@ for author, user_grps in user_scores.items():
 
 # Save the results to CSV and plot
 print("Saving results...")
+estimates = []
 for user_grp in ["SW", "MH", "Otr"]:
     for subreddit_grp in ["SW", "MH", "Otr"]:
-        filename = OUTPUT_DIR + f"sentiment_scores_{user_grp}_{subreddit_grp}.csv"
+        filename = OUTPUT_DIR + f"sentiment_scores_{user_grp}_{subreddit_grp}{SUFFIX}.csv"
         with open(filename, "w", newline="") as csvfile:
             writer = csv.writer(csvfile)
             writer.writerow(["User", "Average Sentiment Score"])
@@ -74,12 +80,17 @@ for user_grp in ["SW", "MH", "Otr"]:
 
         # Plot sentiment score distributions
         scores = [user_grps[user_grp][subreddit_grp] for author, user_grps in final_scores.items() if user_grp in user_grps and subreddit_grp in user_grps[user_grp]]
+        estimates.append((f"{user_grp}-{subreddit_grp} users", estimate_count(len(scores), SAMPLE_FRACTION), len(scores)))
+        estimates.append((f"{user_grp}-{subreddit_grp} mean sentiment", estimate_mean(scores, SAMPLE_FRACTION), len(scores)))
         plt.figure()
         plt.hist(scores, bins=30, alpha=0.7, label=f"{user_grp}-{subreddit_grp} Sentiment Scores")
         plt.title(f'Sentiment Score Distribution: {user_grp} Users in {subreddit_grp}')
         plt.xlabel('Average Sentiment Score')
         plt.ylabel('Frequency')
         plt.legend()
-        plt.savefig(OUTPUT_DIR + f"sentiment_distribution_{user_grp}_{subreddit_grp}.png")
+        plt.savefig(OUTPUT_DIR + f"sentiment_distribution_{user_grp}_{subreddit_grp}{SUFFIX}.png")
+
+# Population estimates (exact for a full run, scaled up with standard errors for a sampled one)
+save_estimates(OUTPUT_DIR + f"sentiment_estimates{SUFFIX}.csv", estimates, SAMPLE_FRACTION)
 
 print("Analysis complete. Data and plots saved to the './step1/' directory.")
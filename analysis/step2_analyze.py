@@ -1,4 +1,3 @@
-from pymongo import MongoClient
 import pandas as pd
 import random
 import os
@@ -8,14 +7,18 @@ from nltk.tokenize import word_tokenize, sent_tokenize
 from nltk.tag import pos_tag
 import textstat
 from collections import Counter
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from reddit_db import get_db
+from author_sampling import sample_fraction, sample_filter, sample_suffix, ensure_author_buckets
 
 # Download necessary NLTK resources
 nltk.download('punkt')
 nltk.download('averaged_perceptron_tagger')
 
 # MongoDB connection setup
-client = MongoClient()
-db = client['reddit']
+db = get_db()
 
 # Collection names and parameters
 submissions_collection_name = "stat_submissions"
@@ -23,6 +26,8 @@ comments_collection_name = "stat_comments"
 output_dir = "./step2/stats"
 batch_size = 1000  # Adjust based on memory capacity
 sample_size = 250000  # Number of samples to take for each group
+sample_frac = sample_fraction()  # Fraction of authors drawn from; set SAMPLE_FRACTION=0.01 for a quick run
+suffix = sample_suffix(sample_frac)
 
 # Define valid combinations for analysis
 valid_combinations = {
@@ -106,7 +111,7 @@ def process_text(text):
 def sample_and_save_raw_data(collection_name, valid_combinations, output_dir, sample_size, batch_size):
     for (user_grp, subreddit_grp) in valid_combinations:
         n_samples = sample_size  # Use the specified sample size for each group combination
-        output_path = f'{output_dir}/{collection_name}_{user_grp}_{subreddit_grp}_raw.csv'
+        output_path = f'{output_dir}/{collection_name}_{user_grp}_{subreddit_grp}{suffix}_raw.csv'
 
         if os.path.exists(output_path):
             print(f"Raw data file {output_path} already exists. Skipping sampling.")
@@ -116,7 +121,7 @@ def sample_and_save_raw_data(collection_name, valid_combinations, output_dir, sa
         progress = tqdm(total=n_samples, desc=f"Sampling {user_grp}/{subreddit_grp} in {collection_name}")
 
         while len(sampled_docs) < n_samples:
-            cursor = db[collection_name].find({'user_grp': user_grp, 'subreddit_grp': subreddit_grp}).limit(batch_size)
+            cursor = db[collection_name].find({'user_grp': user_grp, 'subreddit_grp': subreddit_grp, **sample_filter(sample_frac)}).limit(batch_size)
             batch = list(cursor)
             if not batch:
                 break  # No more documents to sample
@@ -131,8 +136,8 @@ def sample_and_save_raw_data(collection_name, valid_combinations, output_dir, sa
 
 def batch_process_and_analyze(collection_name, valid_combinations, output_dir, batch_size):
     for (user_grp, subreddit_grp) in valid_combinations:
-        input_path = f'{output_dir}/{collection_name}_{user_grp}_{subreddit_grp}_raw.csv'
-        output_path = f'{output_dir}/{collection_name}_{user_grp}_{subreddit_grp}_analysis.csv'
+        input_path = f'{output_dir}/{collection_name}_{user_grp}_{subreddit_grp}{suffix}_raw.csv'
+        output_path = f'{output_dir}/{collection_name}_{user_grp}_{subreddit_grp}{suffix}_analysis.csv'
 
         if not os.path.exists(input_path):
             print(f"Raw data file {input_path} does not exist. Skipping analysis.")
@@ -168,6 +173,7 @@ def batch_process_and_analyze(collection_name, valid_combinations, output_dir, b
         print(f"Saved analysis results to {output_path}")
 
 # Main execution
+ensure_author_buckets(db, [submissions_collection_name, comments_collection_name], sample_frac)
 sample_and_save_raw_data(submissions_collection_name, valid_combinations, output_dir, sample_size, batch_size)
 sample_and_save_raw_data(comments_collection_name, valid_combinations, output_dir, sample_size, batch_size)
 
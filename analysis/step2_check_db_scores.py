@@ -1,12 +1,15 @@
-from pymongo import MongoClient
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import numpy as np
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from reddit_db import get_db
 
 # MongoDB connection setup
-client = MongoClient()
-db = client['reddit']  # Adjust to your database name
+db = get_db()  # Database name is set in db_config.json
 submissions_collection_name = "stat_submissions"  # Adjust to your collection name
 comments_collection_name = "stat_comments"       # Adjust to your collection name
 
@@ -1,4 +1,3 @@
-from pymongo import MongoClient
 import pandas as pd
 from tqdm import tqdm
 import nltk
@@ -6,14 +5,18 @@ from nltk.tokenize import word_tokenize, sent_tokenize
 from nltk.tag import pos_tag
 from collections import Counter
 import textstat
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from reddit_db import get_db
 
 # Download necessary NLTK resources
 nltk.download('punkt')
 nltk.download('averaged_perceptron_tagger')
 
 # MongoDB connection setup
-client = MongoClient()
-db = client['reddit']
+db = get_db()
 
 # Collection names and parameters
 submissions_collection_name = "filtered_submissions_standard"
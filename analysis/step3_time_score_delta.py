@@ -1,11 +1,14 @@
-import pymongo
 import pandas as pd
 from datetime import datetime
 from tqdm import tqdm
 import numpy as np
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from reddit_db import get_db, DB_NAME
 
 # MongoDB Connection Parameters
-DB_NAME = "reddit"
 SUBMISSION_COLLECTION_NAME = "stat_submissions"
 COMMENT_COLLECTION_NAME = "stat_comments"
 BATCH_SIZE = 50000  # Adjust based on memory capacity
@@ -14,8 +17,7 @@ BATCH_SIZE = 50000  # Adjust based on memory capacity
 DECAY_RATE = 0.05
 
 def connect_to_mongodb(db_name):
-    client = pymongo.MongoClient()
-    db = client[db_name]
+    db = get_db(db_name)
     return db
 
 def fetch_data(collection, skip, limit):
@@ -2,11 +2,14 @@ import os
 import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
-from pymongo import MongoClient
 import numpy as np
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from reddit_db import get_db
+from author_sampling import sample_fraction, sample_filter, ensure_author_buckets
 
 # Hyperparameters
-DB_NAME = 'reddit'
 COMMENTS_COLLECTION_NAME = 'filtered_comments_standard'
 SUBMISSIONS_COLLECTION_NAME = 'filtered_submissions_standard'
 INTERACTION_WEIGHT = 1
@@ -15,21 +18,21 @@ SUBREDDIT_DIVERSITY_WEIGHT = 3
 OUTLIER_THRESHOLD_RATIO = 0.90  # Top 20% are considered outliers
 BATCH_SIZE = 500  # Adjustable batch size for processing large datasets
 OVERWRITE = False  # Set to True to overwrite existing 'comm_score' field
+SAMPLE_FRACTION = sample_fraction()  # Fraction of authors scored; set SAMPLE_FRACTION=0.01 for a trial run
 
-client = MongoClient()
-db = client[DB_NAME]
+db = get_db()
 
 def calculate_communication_scores(subreddit_group=None):
-    match_stage = {}
+    match_stage = dict(sample_filter(SAMPLE_FRACTION))
     if subreddit_group and subreddit_group != "ALL":
-        match_stage = {"subreddit_grp": subreddit_group}
+        match_stage["subreddit_grp"] = subreddit_group
 
     pipeline = [
         {"$match": match_stage},
         {
             "$unionWith": {
                 "coll": SUBMISSIONS_COLLECTION_NAME,
-                "pipeline": [{"$project": {"author": 1, "user_grp": 1, "subreddit_grp": 1, "created_day": 1}}]
+                "pipeline": [{"$match": sample_filter(SAMPLE_FRACTION)}, {"$project": {"author": 1, "user_grp": 1, "subreddit_grp": 1, "created_day": 1}}]
             }
         },
         {
@@ -98,6 +101,7 @@ def update_database_with_scores(scores_df, collection_name):
         collection.update_many(query, new_values)
 
 def main():
+    ensure_author_buckets(db, [COMMENTS_COLLECTION_NAME, SUBMISSIONS_COLLECTION_NAME], SAMPLE_FRACTION)
     all_scores = []
     for group in ["SW", "MH", "Otr"]:
         print(f"Processing {group}...")
@@ -1,17 +1,20 @@
-import pymongo
 from tqdm import tqdm
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from reddit_db import get_db, iter_documents
 
 # MongoDB Connection Parameters
-DB_NAME = "reddit"
 COMMENTS_COLLECTION = "filtered_comments_standard"
 SUBMISSIONS_COLLECTION = "filtered_submissions_standard"
 THRESHOLD_RATIO = 0.5  # Threshold for normalization (70%)
 MIN_TIME_BASED_THRESHOLD = 0.01  # Minimum value for considering time_based score
 OVERWRITE_EXISTING = True  # Set to False to skip documents with existing 'time_based_score'
 SKIP_IF_EXISTS = False  # Set to True to skip updating documents that already have 'time_based_score'
+STATE_DIR = "./step3_state"  # Last updated _id per collection, kept only while a run is unfinished; delete to start over
 
-client = pymongo.MongoClient()
-db = client[DB_NAME]
+db = get_db()
 
 def normalize_and_update_scores(collection_name):
     collection = db[collection_name]
@@ -23,9 +26,11 @@ def normalize_and_update_scores(collection_name):
     ])
     threshold_value = next(threshold_value, {}).get('max_score', 0) * THRESHOLD_RATIO
 
-    # Fetch documents and update scores
-    cursor = collection.find({})
-    for doc in tqdm(cursor, total=collection.count_documents({}), desc=f"Updating {collection_name}"):
+    # Fetch documents and update scores; a killed run continues after the last saved _id
+    os.makedirs(STATE_DIR, exist_ok=True)
+    state_file = os.path.join(STATE_DIR, f"{collection_name}.json")
+    cursor = iter_documents(collection, state_file=state_file)
+    for doc in tqdm(cursor, total=collection.estimated_document_count(), desc=f"Updating {collection_name}"):
         if SKIP_IF_EXISTS and 'time_based_score' in doc:
             continue
 
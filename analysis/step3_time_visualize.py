@@ -1,18 +1,19 @@
-import pymongo
 import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
 import os
 from tqdm import tqdm
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from reddit_db import get_db, DB_NAME
 
 # MongoDB Connection Parameters
-DB_NAME = "reddit"
 SUBMISSION_COLLECTION_NAME = "stat_time"
 COMMENT_COLLECTION_NAME = "stat_time"
 
 def connect_to_mongodb(db_name):
-    client = pymongo.MongoClient()
-    db = client[db_name]
+    db = get_db(db_name)
     return db
 
 def fetch_and_process_data(collection):
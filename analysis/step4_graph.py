@@ -1,10 +1,14 @@
 import pandas as pd
-from pymongo import MongoClient
 from tqdm import tqdm
 import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from reddit_db import get_db
+from db_indexes import prepare_stage
+from author_sampling import sample_fraction, sample_filter, sample_suffix, ensure_author_buckets
 
 # MongoDB setup
-DB_NAME = 'reddit'
 COMMENTS_COLLECTION_NAME = 'filtered_comments_standard'
 SUBMISSIONS_COLLECTION_NAME = 'filtered_submissions_standard'
 USER_COLLECTION_NAME = 'filtered_submissions_standard'  # Updated collection name for users
@@ -18,16 +22,16 @@ SUBMISSION_COMMENT_WEIGHT = 0.5
 REPEATED_COMMENT_MULTIPLIER = 9
 ZERO_SCORE_COMMENT_ADJUSTMENT = 2
 ZERO_SCORE_SUBMISSION_ADJUSTMENT = -0.5
+SAMPLE_FRACTION = sample_fraction()  # Fraction of authors drawn from; set SAMPLE_FRACTION=0.01 for a trial run
 
-client = MongoClient()
-db = client[DB_NAME]
+db = get_db()
 
 def fetch_target_users(user_group):
     print(f"Connecting to DB... Accessing collection: {USER_COLLECTION_NAME}")
     user_col = db[USER_COLLECTION_NAME]
     try:
         pipeline = [
-            {"$match": {"user_grp": user_group}},
+            {"$match": {"user_grp": user_group, **sample_filter(SAMPLE_FRACTION)}},
             {"$group": {"_id": "$author"}},
             {"$limit": BATCH_SIZE}
         ]
@@ -111,6 +115,10 @@ def calculate_scores_for_user(user):
     return scores
 
 def main():
+    # The per-(author, subreddit_grp, month) queries below need the step4 compound indexes
+    prepare_stage(db, 'step4')
+    ensure_author_buckets(db, [COMMENTS_COLLECTION_NAME, SUBMISSIONS_COLLECTION_NAME], SAMPLE_FRACTION)
+
     if not os.path.exists(OUTPUT_DIR):
         os.makedirs(OUTPUT_DIR)
 
@@ -130,7 +138,7 @@ def main():
                 pbar.update(1)
 
         scores_df = pd.DataFrame(all_scores)
-        scores_df.to_csv(os.path.join(OUTPUT_DIR, f"user_interaction_scores_{user_group}.csv"), index=False)
+        scores_df.to_csv(os.path.join(OUTPUT_DIR, f"user_interaction_scores_{user_group}{sample_suffix(SAMPLE_FRACTION)}.csv"), index=False)
 
 if __name__ == "__main__":
     main()
@@ -1,8 +1,13 @@
-from pymongo import MongoClient
 from tqdm import tqdm
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from reddit_db import get_db
+from db_indexes import prepare_stage
+from author_sampling import sample_fraction, sample_filter, ensure_author_buckets
 
 # MongoDB setup
-DB_NAME = 'reddit'
 COMMENTS_COLLECTION_NAME = 'filtered_comments_standard'
 SUBMISSIONS_COLLECTION_NAME = 'filtered_submissions_standard'
 USER_COLLECTION_NAME = 'filtered_submissions_standard'  # Updated collection name for users
@@ -15,9 +20,9 @@ SUBMISSION_COMMENT_WEIGHT = 0.5
 REPEATED_COMMENT_MULTIPLIER = 9
 ZERO_SCORE_COMMENT_ADJUSTMENT = 2
 ZERO_SCORE_SUBMISSION_ADJUSTMENT = -0.5
+SAMPLE_FRACTION = sample_fraction()  # Fraction of authors scored; set SAMPLE_FRACTION=0.01 for a trial run
 
-client = MongoClient()
-db = client[DB_NAME]
+db = get_db()
 
 def update_document(user, subreddit_grp, month, score, collection_name):
     query = {"author": user, "subreddit_grp": subreddit_grp, "created_day": {"$regex": f"^{month}-"}}
@@ -58,7 +63,11 @@ def calculate_and_update_scores(user, subreddit_grp, month, collection, collecti
     update_document(user, subreddit_grp, month, total_score, collection_name)
 
 def main():
-    users = db[USER_COLLECTION_NAME].distinct("author")
+    # The per-(author, subreddit_grp, month) queries below need the step4 compound indexes
+    prepare_stage(db, 'step4')
+    ensure_author_buckets(db, [COMMENTS_COLLECTION_NAME, SUBMISSIONS_COLLECTION_NAME], SAMPLE_FRACTION)
+
+    users = db[USER_COLLECTION_NAME].distinct("author", sample_filter(SAMPLE_FRACTION))
     unique_users = list(set(users))
 
     for user in tqdm(unique_users, desc="Processing Users"):
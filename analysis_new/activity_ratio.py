@@ -1,16 +1,23 @@
 import matplotlib.pyplot as plt
 import seaborn as sns
-from pymongo import MongoClient
 import pandas as pd
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from reddit_db import get_db
+from author_sampling import sample_fraction, sample_filter, sample_suffix, ensure_author_buckets, estimate_count, estimate_mean, save_estimates
 
 # Hyperparameters
-DB_NAME = 'reddit'
 COLLECTION_COMMENTS = 'relevant_comments'
 COLLECTION_SUBMISSIONS = 'relevant_submissions'
+SAMPLE_FRACTION = sample_fraction()  # Fraction of authors counted; set SAMPLE_FRACTION=0.01 for a quick run
+SUFFIX = sample_suffix(SAMPLE_FRACTION)
+estimates = []
 
 # Establish MongoDB connection
-client = MongoClient()
-db = client[DB_NAME]
+db = get_db()
+ensure_author_buckets(db, [COLLECTION_COMMENTS, COLLECTION_SUBMISSIONS], SAMPLE_FRACTION)
 
 # Function to fetch data and calculate activity ratios
 def calculate_activity_ratios(user_group, collection_comments, collection_submissions):
@@ -18,7 +25,7 @@ def calculate_activity_ratios(user_group, collection_comments, collection_submis
         return pd.Series({'SW': 0, 'MH': 0, 'Otr': 1}, name=user_group)
 
     pipeline = [
-        {'$match': {'user_grp': user_group}},
+        {'$match': {'user_grp': user_group, **sample_filter(SAMPLE_FRACTION)}},
         {'$group': {
             '_id': '$author',
             'total': {'$sum': 1},
@@ -39,6 +46,11 @@ def calculate_activity_ratios(user_group, collection_comments, collection_submis
     if len(results) == 0:
         return pd.Series({'SW': 0, 'MH': 0, 'Otr': 0}, name=user_group)
 
+    # Population estimates of the averages below (one row per user per collection, as averaged)
+    estimates.append((f"{user_group} users", estimate_count(len(results), SAMPLE_FRACTION), len(results)))
+    for field in ['sw_ratio', 'mh_ratio', 'otr_ratio']:
+        estimates.append((f"{user_group} mean {field}", estimate_mean([user[field] for user in results], SAMPLE_FRACTION), len(results)))
+
     # Calculate average ratios
     avg_sw_ratio = sum([user['sw_ratio'] for user in results]) / len(results)
     avg_mh_ratio = sum([user['mh_ratio'] for user in results]) / len(results)
@@ -60,4 +72,5 @@ sns.heatmap(ratios_df, annot=True, cmap='coolwarm')
 plt.title('Activity Ratios of User Groups Across Subreddit Groups')
 plt.ylabel('User Group')
 plt.xlabel('Subreddit Group')
-plt.savefig('heatmap_relevant.png')
+plt.savefig(f'heatmap_relevant{SUFFIX}.png')
+save_estimates(f'activity_ratio_estimates{SUFFIX}.csv', estimates, SAMPLE_FRACTION)
@@ -1,18 +1,21 @@
-from pymongo import MongoClient
 from nltk import pos_tag, word_tokenize, download
 from textstat import flesch_reading_ease
 from collections import Counter, defaultdict
 from tqdm import tqdm
 import csv
 from datetime import datetime
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from reddit_db import get_db
 
 # Ensure required NLTK resources are downloaded
 download('punkt')
 download('averaged_perceptron_tagger')
 
 # MongoDB connection setup
-client = MongoClient()
-db = client['reddit']
+db = get_db()
 
 # Collection names
 submissions_collection_name = "relevant_submissions"
@@ -1,4 +1,3 @@
-from pymongo import MongoClient
 import pandas as pd
 from tqdm import tqdm
 import nltk
@@ -9,10 +8,13 @@ import os
 import matplotlib.pyplot as plt
 import seaborn as sns
 from gensim import corpora, models
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from reddit_db import get_db
 
 # MongoDB connection setup
-client = MongoClient()
-db = client['reddit']
+db = get_db()
 collection_names = ['relevant_submissions', 'relevant_comments']
 batch_size = 500
 
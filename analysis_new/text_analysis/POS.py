@@ -1,4 +1,3 @@
-from pymongo import MongoClient
 import pandas as pd
 from nltk.tokenize import word_tokenize
 from nltk import pos_tag
@@ -8,14 +7,17 @@ import os
 import seaborn as sns
 import matplotlib.pyplot as plt
 from collections import Counter
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from reddit_db import get_db
 
 # NLTK setup
 nltk.download('punkt')
 nltk.download('averaged_perceptron_tagger')
 
 # MongoDB connection setup
-client = MongoClient()
-db = client['reddit']
+db = get_db()
 collections = ['relevant_submissions', 'relevant_comments']
 batch_size = 500
 
@@ -1,4 +1,3 @@
-from pymongo import MongoClient
 from nltk.tokenize import word_tokenize
 from nltk.corpus import stopwords
 import nltk
@@ -7,6 +6,10 @@ import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
 import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from reddit_db import get_db
 
 # NLTK setup
 nltk.download('punkt')
@@ -14,8 +17,7 @@ nltk.download('stopwords')
 stop_words = set(stopwords.words('english'))
 
 # MongoDB setup
-client = MongoClient()
-db = client['reddit']
+db = get_db()
 collections = ['relevant_submissions', 'relevant_comments']
 batch_size = 500
 
@@ -1,21 +1,28 @@
-import pymongo
 import pandas as pd
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 import matplotlib.pyplot as plt
 import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from reddit_db import get_db, close_client, iter_documents
+from author_sampling import sample_fraction, sample_filter, sample_suffix, ensure_author_buckets, estimate_count, estimate_mean, save_estimates
 
 # Initialization Parameters
 db_name = 'reddit'
 collection_submissions = 'relevant_submissions'
 collection_comments = 'relevant_comments'
 output_dir = './analyze'
-output_csv = os.path.join(output_dir, 'user_centric_analysis.csv')
-output_viz = os.path.join(output_dir, 'user_sentiment_distribution.png')
+sample_frac = sample_fraction()  # Fraction of authors analyzed; set SAMPLE_FRACTION=0.01 for a quick run
+suffix = sample_suffix(sample_frac)
+output_csv = os.path.join(output_dir, f'user_centric_analysis{suffix}.csv')
+output_viz = os.path.join(output_dir, f'user_sentiment_distribution{suffix}.png')
+output_estimates = os.path.join(output_dir, f'user_centric_estimates{suffix}.csv')
 
 def analyze_user_centric(db_name, collection_submissions, collection_comments, output_csv, output_viz):
     # MongoDB Connection
-    client = pymongo.MongoClient()
-    db = client[db_name]
+    db = get_db(db_name)
+    ensure_author_buckets(db, [collection_submissions, collection_comments], sample_frac)
 
     # Initialize Sentiment Analyzer
     analyzer = SentimentIntensityAnalyzer()
@@ -41,13 +48,11 @@ def analyze_user_centric(db_name, collection_submissions, collection_comments, o
                 user_data[author]['sentiment'] += sentiment
                 user_data[author]['count'] += 1
 
-    # Fetch and process submissions
-    submissions_cursor = db[collection_submissions].find({}, no_cursor_timeout=True)
-    process_documents(submissions_cursor)
-
-    # Fetch and process comments
-    comments_cursor = db[collection_comments].find({}, no_cursor_timeout=True)
-    process_documents(comments_cursor)
+    # Fetch and process submissions and comments; the scans reopen their cursor if it times out
+    projection = {'author': 1, 'body': 1}
+    sample = sample_filter(sample_frac)
+    process_documents(iter_documents(db[collection_submissions], filter=sample, projection=projection))
+    process_documents(iter_documents(db[collection_comments], filter=sample, projection=projection))
 
     # Convert user data to DataFrame
     df_user_data = pd.DataFrame.from_dict(user_data, orient='index')
@@ -58,6 +63,13 @@ def analyze_user_centric(db_name, collection_submissions, collection_comments, o
         os.makedirs(output_dir)
     df_user_data.to_csv(output_csv)
 
+    # Population estimates (exact for a full run, scaled up with standard errors for a sampled one)
+    sentiments = df_user_data['avg_sentiment'].tolist()
+    save_estimates(output_estimates, [
+        ("users", estimate_count(len(sentiments), sample_frac), len(sentiments)),
+        ("mean user sentiment", estimate_mean(sentiments, sample_frac), len(sentiments)),
+    ], sample_frac)
+
     # Visualization
     plt.figure(figsize=(10, 6))
     df_user_data['avg_sentiment'].hist(bins=50)
@@ -66,10 +78,7 @@ def analyze_user_centric(db_name, collection_submissions, collection_comments, o
     plt.ylabel('Number of Users')
     plt.savefig(output_viz)
 
-    # Close the cursor
-    submissions_cursor.close()
-    comments_cursor.close()
-    client.close()
+    close_client()
 
 # Running the analysis
 analyze_user_centric(db_name, collection_submissions, collection_comments, output_csv, output_viz)
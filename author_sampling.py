@@ -0,0 +1,135 @@
+import argparse
+import csv
+import hashlib
+import math
+import os
+from collections import defaultdict
+from pymongo import UpdateMany
+from tqdm import tqdm
+from reddit_db import get_db, close_client
+
+# Constants
+NUM_BUCKETS = 10000  # Sampling fractions are rounded to multiples of 1 / NUM_BUCKETS
+BUCKET_FIELD = "author_bucket"
+SAMPLE_FRACTION_VAR = "SAMPLE_FRACTION"  # e.g. SAMPLE_FRACTION=0.01 python step1_sentiment_score.py
+AUTHOR_BATCH_SIZE = 1000  # Authors per bulk_write when backfilling buckets
+
+# Collections read by the analysis entry points
+COLLECTIONS = [
+    'filtered_comments_standard', 'filtered_submissions_standard',
+    'filtered_comments_sentiment', 'filtered_submissions_sentiment',
+    'relevant_comments', 'relevant_submissions',
+    'stat_comments', 'stat_submissions',
+]
+
+def author_bucket(author):
+    """Bucket of an author in [0, NUM_BUCKETS), the same on every machine and run (unlike hash())."""
+    digest = hashlib.md5(str(author).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % NUM_BUCKETS
+
+def sample_fraction(default=1.0):
+    """Fraction of authors to analyze, from the SAMPLE_FRACTION environment variable."""
+    fraction = float(os.environ.get(SAMPLE_FRACTION_VAR, default))
+    if not 0 < fraction <= 1:
+        raise ValueError(f"{SAMPLE_FRACTION_VAR} must be in (0, 1], got {fraction}")
+    return fraction
+
+def bucket_limit(fraction):
+    return max(1, min(NUM_BUCKETS, round(fraction * NUM_BUCKETS)))
+
+def effective_fraction(fraction):
+    """The fraction actually sampled once rounded to whole buckets."""
+    return bucket_limit(fraction) / NUM_BUCKETS
+
+def sample_filter(fraction):
+    """Query filter keeping the authors whose bucket falls under fraction; {} for a full run."""
+    if bucket_limit(fraction) >= NUM_BUCKETS:
+        return {}
+    return {BUCKET_FIELD: {"$lt": bucket_limit(fraction)}}
+
+def sample_suffix(fraction):
+    """Output file suffix, so a sampled run never overwrites (or is mistaken for) a full one."""
+    return "" if bucket_limit(fraction) >= NUM_BUCKETS else f"_sample{effective_fraction(fraction):g}"
+
+def add_author_buckets(db, collection_name):
+    """Set BUCKET_FIELD on the documents that don't have it yet, one UpdateMany per bucket of each author batch."""
+    collection = db[collection_name]
+    missing = {BUCKET_FIELD: {"$exists": False}}
+    authors = [doc["_id"] for doc in collection.aggregate([{"$match": missing}, {"$group": {"_id": "$author"}}], allowDiskUse=True)]
+    updated = 0
+    for i in tqdm(range(0, len(authors), AUTHOR_BATCH_SIZE), desc=f"Bucketing {collection_name}", unit=" batches"):
+        by_bucket = defaultdict(list)
+        for author in authors[i:i + AUTHOR_BATCH_SIZE]:
+            by_bucket[author_bucket(author)].append(author)
+        requests = [UpdateMany({"author": {"$in": batch}, **missing}, {"$set": {BUCKET_FIELD: bucket}})
+                    for bucket, batch in by_bucket.items()]
+        updated += collection.bulk_write(requests, ordered=False).modified_count
+    print(f"{collection_name}: {BUCKET_FIELD} set on {updated} documents of {len(authors)} authors")
+
+def ensure_author_buckets(db, collection_names, fraction):
+    """Before a sampled run: backfill buckets of documents loaded since the last run, and index the field."""
+    if not sample_filter(fraction):
+        return
+    for collection_name in collection_names:
+        collection = db[collection_name]
+        collection.create_index(BUCKET_FIELD)
+        if collection.find_one({BUCKET_FIELD: {"$exists": False}}, {"_id": 1}):
+            add_author_buckets(db, collection_name)
+    print(f"Sampling {effective_fraction(fraction):.2%} of authors ({BUCKET_FIELD} < {bucket_limit(fraction)})")
+
+# Authors are kept independently of each other with probability f, so a total over authors is
+# estimated by sum(y) / f with variance (1 - f) / f^2 * sum(y^2) (Horvitz-Thompson), and a mean
+# over authors by the sample mean with variance (1 - f) * s^2 / n. A full run has SE 0.
+
+def estimate_total(values, fraction):
+    """(estimate, SE) of a population total from one value per sampled author."""
+    f = effective_fraction(fraction)
+    values = list(values)
+    total = sum(values) / f
+    se = math.sqrt((1 - f) * sum(value * value for value in values)) / f
+    return total, se
+
+def estimate_count(n, fraction):
+    """(estimate, SE) of the number of authors, from the n sampled ones."""
+    return estimate_total([1] * n, fraction)
+
+def estimate_mean(values, fraction):
+    """(estimate, SE) of a mean over authors from one value per sampled author."""
+    f = effective_fraction(fraction)
+    values = list(values)
+    n = len(values)
+    if n == 0:
+        return float("nan"), float("nan")
+    mean = sum(values) / n
+    if n == 1:
+        return mean, 0.0 if f >= 1 else float("nan")
+    variance = sum((value - mean) ** 2 for value in values) / (n - 1)
+    return mean, math.sqrt((1 - f) * variance / n)
+
+def save_estimates(path, estimates, fraction):
+    """Write [(name, (estimate, SE), n_sampled), ...] to a CSV and print them."""
+    with open(path, "w", newline="") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["Name", "Estimate", "SE", "Sampled", "Fraction"])
+        for name, (estimate, se), n in estimates:
+            writer.writerow([name, estimate, se, n, effective_fraction(fraction)])
+            print(f"{name}: {estimate:.6g} (SE {se:.3g}, {n} sampled)")
+    print(f"Estimates saved to {path}")
+
+def main():
+    parser = argparse.ArgumentParser(description=f"Backfill and index {BUCKET_FIELD} for sampled analysis runs")
+    parser.add_argument("collections", nargs="*", default=COLLECTIONS)
+    args = parser.parse_args()
+
+    db = get_db()
+    existing = set(db.list_collection_names())
+    for collection_name in args.collections:
+        if collection_name not in existing:
+            print(f"{collection_name}: not found, skipped")
+            continue
+        add_author_buckets(db, collection_name)
+        db[collection_name].create_index(BUCKET_FIELD)
+    close_client()
+
+if __name__ == "__main__":
+    main()
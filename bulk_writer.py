@@ -0,0 +1,167 @@
+import queue
+import threading
+import time
+from pymongo import UpdateOne
+from pymongo.errors import AutoReconnect, BulkWriteError, NetworkTimeout
+from tqdm import tqdm
+from reddit_db import WRITE_BATCH_SIZE
+
+# Constants
+FLUSH_INTERVAL = 2.0  # Seconds a partial batch may wait before it is written anyway
+MAX_QUEUED = 10 * WRITE_BATCH_SIZE  # Pending writes before update() blocks the producer (backpressure)
+MAX_WRITE_RETRIES = 5  # Attempts per batch on AutoReconnect / NetworkTimeout ($set by _id is safe to repeat)
+REPORT_INTERVAL = 60  # Seconds between metrics lines while writing
+
+_FLUSH = object()
+_STOP = object()
+
+class BulkWriter:
+    """Buffers UpdateOne requests and writes them from a background thread with bulk_write(ordered=False).
+
+    A batch is written once it has batch_size requests, once its oldest request waited flush_interval
+    seconds, or on flush(). The queue holds at most max_queued requests: when Mongo falls behind,
+    update() blocks until the writer catches up instead of buffering without bound. Use as a context
+    manager, or call close(), so the last batch is written. A failed write, including a single failed
+    request of a batch, is raised to the producer on its next update(), flush() or close(); the
+    requests queued after it are not written.
+    """
+
+    def __init__(self, collection, batch_size=WRITE_BATCH_SIZE, flush_interval=FLUSH_INTERVAL, max_queued=MAX_QUEUED, name=None):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.name = name or collection.name
+        self.queue = queue.Queue(maxsize=max_queued)
+        self.error = None
+        self.lock = threading.Lock()
+        self.stats = {"written": 0, "matched": 0, "batches": 0, "write_errors": 0, "skipped": 0, "retries": 0,
+                      "write_seconds": 0.0, "max_write_seconds": 0.0, "blocked_seconds": 0.0, "max_queue_depth": 0}
+        self.last_report = time.monotonic()
+        self.thread = threading.Thread(target=self._run, name=f"BulkWriter-{self.name}", daemon=True)
+        self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Don't replace an exception that is already on its way out (often the write error itself)
+        self.close(raise_error=exc_type is None)
+
+    def update(self, doc_id, fields):
+        """Queue {"$set": fields} for the document with _id doc_id."""
+        self.add(UpdateOne({"_id": doc_id}, {"$set": fields}))
+
+    def add(self, request):
+        self._raise_error()
+        try:
+            self.queue.put_nowait(request)
+        except queue.Full:
+            start = time.perf_counter()
+            self.queue.put(request)
+            with self.lock:
+                self.stats["blocked_seconds"] += time.perf_counter() - start
+        depth = self.queue.qsize()
+        if depth > self.stats["max_queue_depth"]:
+            with self.lock:
+                self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], depth)
+
+    def flush(self):
+        """Write everything queued so far and wait until it is in the database."""
+        self.queue.put(_FLUSH)
+        self.queue.join()
+        self._raise_error()
+
+    def close(self, raise_error=True):
+        if self.thread.is_alive():
+            self.queue.put(_STOP)
+            self.thread.join()
+        self.report()
+        if raise_error:
+            self._raise_error()
+
+    def metrics(self):
+        """Counters so far, with the current queue depth and the mean write latency."""
+        with self.lock:
+            metrics = dict(self.stats)
+        metrics["queue_depth"] = self.queue.qsize()
+        metrics["mean_write_seconds"] = metrics["write_seconds"] / metrics["batches"] if metrics["batches"] else 0.0
+        return metrics
+
+    def report(self):
+        m = self.metrics()
+        tqdm.write(f"[{self.name} writer] {m['written']} writes in {m['batches']} bulk_writes, "
+                   f"latency {m['mean_write_seconds'] * 1000:.0f}ms mean / {m['max_write_seconds'] * 1000:.0f}ms max, "
+                   f"queue {m['queue_depth']} now / {m['max_queue_depth']} max, producer blocked {m['blocked_seconds']:.1f}s, "
+                   f"{m['write_errors']} write errors, {m['skipped']} skipped after an error")
+
+    def _raise_error(self):
+        if self.error is not None:
+            raise RuntimeError(f"Background writes to {self.name} failed") from self.error
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            timeout = max(0.0, deadline - time.monotonic()) if batch else None
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                batch = self._write(batch)
+                continue
+            if item is _STOP or item is _FLUSH:
+                batch = self._write(batch)
+                self.queue.task_done()
+                if item is _STOP:
+                    return
+                continue
+            batch.append(item)
+            if len(batch) == 1:
+                deadline = time.monotonic() + self.flush_interval
+            if len(batch) >= self.batch_size:
+                batch = self._write(batch)
+
+    def _write(self, batch):
+        if batch and self.error is None:
+            start = time.perf_counter()
+            try:
+                result = self._bulk_write(batch)
+                applied, matched = len(batch), result.matched_count
+            except BulkWriteError as e:
+                # Unordered: the rest of the batch was still applied, but the producer must not take
+                # the failed requests as written
+                failed = len(e.details.get("writeErrors", []))
+                applied, matched = len(batch) - failed, e.details.get("nMatched", 0)
+                with self.lock:
+                    self.stats["write_errors"] += failed
+                self.error = e
+            except Exception as e:
+                # Keep draining the queue so the producer isn't stuck on a full queue; it gets the error instead
+                self.error = e
+                applied = matched = 0
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.stats["written"] += applied
+                self.stats["matched"] += matched
+                self.stats["batches"] += 1
+                self.stats["write_seconds"] += elapsed
+                self.stats["max_write_seconds"] = max(self.stats["max_write_seconds"], elapsed)
+            if time.monotonic() - self.last_report >= REPORT_INTERVAL:
+                self.last_report = time.monotonic()
+                self.report()
+        elif batch:
+            with self.lock:
+                self.stats["skipped"] += len(batch)
+        for _ in batch:
+            self.queue.task_done()
+        return []
+
+    def _bulk_write(self, batch):
+        for attempt in range(1, MAX_WRITE_RETRIES + 1):
+            try:
+                return self.collection.bulk_write(batch, ordered=False)
+            except (AutoReconnect, NetworkTimeout):
+                if attempt == MAX_WRITE_RETRIES:
+                    raise
+                with self.lock:
+                    self.stats["retries"] += 1
+                time.sleep(min(2 ** attempt, 30))
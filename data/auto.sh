@@ -1,4 +1,5 @@
 #!/bin/bash
+# Superseded by scheduler.py, which overlaps copy/convert/move across months; kept for reference.
 
 # Define directories
 HDD_DIR_COMMENTS="/mnt/LaCie_2/reddit/comments"
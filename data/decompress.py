@@ -2,59 +2,116 @@ import zstandard as zstd
 import json
 import csv
 import os
-import sys
-import threading
+import time
+from collections import defaultdict, deque
+from multiprocessing import Pool
 from tqdm import tqdm
-from queue import Queue
-
-sys.set_int_max_str_digits(40000)
+from zst_stream import iter_zst_lines, MAX_WINDOW_SIZE
+from schema import FIELDS_BY_PREFIX
 
 CHUNK_SIZE = 8192
-BATCH_SIZE = 10000
-NUM_THREADS = 8
+BLOCK_SIZE = 10000  # Lines sent to a worker process at a time
+NUM_WORKERS = 8
+MAX_PENDING_BLOCKS = NUM_WORKERS * 4  # Blocks in flight before the reader waits for the writer
 FILE_BATCH_SIZE = 800000  # The threshold for segmenting files
-
-file_counter = {}  # To keep track of file parts for each main file
-
-def worker(queue, all_fields, comments_lock, output_file_base):
-    comments = []
-    while True:
-        line = queue.get()
-        if line is None:
-            break
-
+STREAMING = True  # Feed decompressed lines straight to the workers instead of going through a .temp file
+
+def parse_block(lines, fields):
+    # Runs in a worker process: decode one block of lines into column lists
+    start = time.perf_counter()
+    columns = [[] for _ in fields]
+    bad_lines = 0
+    for line in lines:
         try:
-            comment = json.loads(line)
-            with comments_lock:
-                all_fields.update(comment.keys())
-                comments.append(comment)
-
-                if len(comments) >= BATCH_SIZE:
-                    current_output_file = f"{output_file_base}_part{file_counter[output_file_base]}.csv"
-                    write_to_csv(current_output_file, comments, all_fields, mode='a')
-                    comments.clear()
-                    if os.path.getsize(current_output_file) > FILE_BATCH_SIZE:
-                        file_counter[output_file_base] += 1
-        except:
-            pass
-        finally:
-            queue.task_done()
-
-    if comments:
-        current_output_file = f"{output_file_base}_part{file_counter[output_file_base]}.csv"
-        write_to_csv(current_output_file, comments, all_fields, mode='a')
-
-def write_to_csv(output_file_path, comments, all_fields, mode='w'):
-    with open(output_file_path, mode, newline='', encoding='utf-8') as outfile:
-        writer = csv.DictWriter(outfile, fieldnames=list(all_fields))
-        if mode == 'w' or (mode == 'a' and os.path.getsize(output_file_path) == 0):
-            writer.writeheader()
-        for comment in comments:
-            writer.writerow(comment)
+            record = json.loads(line)
+        except ValueError:
+            bad_lines += 1
+            continue
+        for column, field in zip(columns, fields):
+            column.append(record.get(field))
+    return columns, len(lines), bad_lines, os.getpid(), time.perf_counter() - start
+
+def iter_blocks(lines, block_size):
+    block = []
+    for line in lines:
+        line = line.strip()
+        if line:
+            block.append(line)
+        if len(block) >= block_size:
+            yield block
+            block = []
+    if block:
+        yield block
+
+class PartWriter:
+    """Single writer that appends column batches in order and rolls over to a new part file by size."""
+
+    def __init__(self, output_file_base, fields):
+        self.output_file_base = output_file_base
+        self.fields = fields
+        self.part = 0
+        self.outfile = None
+        self.writer = None
+
+    def _open_part(self):
+        path = f"{self.output_file_base}_part{self.part}.csv"
+        self.outfile = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.outfile)
+        self.writer.writerow(self.fields)
+
+    def write_columns(self, columns):
+        if self.outfile is None:
+            self._open_part()
+        self.writer.writerows(zip(*columns))
+        if self.outfile.tell() > FILE_BATCH_SIZE:
+            self.outfile.close()
+            self.outfile = None
+            self.part += 1
+
+    def close(self):
+        if self.outfile is not None:
+            self.outfile.close()
+
+def report_worker_stats(worker_stats, wall_time):
+    total_lines = sum(lines for lines, _ in worker_stats.values())
+    for pid, (lines, busy) in sorted(worker_stats.items()):
+        rate = lines / busy if busy else 0
+        print(f"  worker {pid}: {lines} lines, {rate:,.0f} lines/sec while busy")
+    print(f"  total: {total_lines} lines in {wall_time:.1f}s ({total_lines / wall_time:,.0f} lines/sec)")
+
+def process_lines(lines, output_file_base, fields):
+    writer = PartWriter(output_file_base, fields)
+    worker_stats = defaultdict(lambda: [0, 0.0])  # pid -> [lines, seconds spent parsing]
+    bad_lines = 0
+    start = time.perf_counter()
+
+    with Pool(NUM_WORKERS) as pool, tqdm(desc="Processing", unit=" lines") as pbar:
+        # Results are consumed in submission order, so the output keeps the dump's order
+        pending = deque()
+
+        def drain_one():
+            nonlocal bad_lines
+            columns, n_lines, n_bad, pid, elapsed = pending.popleft().get()
+            writer.write_columns(columns)
+            worker_stats[pid][0] += n_lines
+            worker_stats[pid][1] += elapsed
+            bad_lines += n_bad
+            pbar.update(n_lines)
+
+        for block in iter_blocks(lines, BLOCK_SIZE):
+            pending.append(pool.apply_async(parse_block, (block, fields)))
+            if len(pending) >= MAX_PENDING_BLOCKS:
+                drain_one()
+        while pending:
+            drain_one()
+
+    writer.close()
+    print(f"Finished {output_file_base}: {bad_lines} unparsable lines skipped")
+    report_worker_stats(worker_stats, time.perf_counter() - start)
 
 def decompress_to_temp_file(input_file_path, temp_file_path):
     with open(input_file_path, 'rb') as f, open(temp_file_path, 'w', encoding='utf-8') as tf:
-        dctx = zstd.ZstdDecompressor()
+        dctx = zstd.ZstdDecompressor(max_window_size=MAX_WINDOW_SIZE)
         with dctx.stream_reader(f) as reader:
             while True:
                 chunk = reader.read(CHUNK_SIZE)
@@ -62,46 +119,42 @@ def decompress_to_temp_file(input_file_path, temp_file_path):
                     break
                 tf.write(chunk.decode('utf-8'))
 
-def process_temp_file(temp_file_path, output_file_base):
-    all_fields = set()
-    comments_lock = threading.Lock()
-    queue = Queue()
+def process_temp_file(temp_file_path, output_file_base, fields):
+    with open(temp_file_path, 'r', encoding='utf-8') as f:
+        process_lines(f, output_file_base, fields)
 
-    if output_file_base not in file_counter:
-        file_counter[output_file_base] = 0
+    os.remove(temp_file_path)  # Delete the temporary file after processing
 
-    threads = []
-    for _ in range(NUM_THREADS):
-        t = threading.Thread(target=worker, args=(queue, all_fields, comments_lock, output_file_base))
-        t.start()
-        threads.append(t)
+def process_stream(input_file_path, output_file_base, fields):
+    process_lines(iter_zst_lines(input_file_path), output_file_base, fields)
 
-    with open(temp_file_path, 'r', encoding='utf-8') as f:
-        for line in tqdm(f, desc="Processing"):
-            queue.put(line.strip())
+def main():
+    input_dir = "compressed"
+    output_dir = "processed"
 
-    for _ in range(NUM_THREADS):
-        queue.put(None)
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
 
-    for t in threads:
-        t.join()
+    for filename in os.listdir(input_dir):
+        if filename.endswith(".zst"):
+            fields = FIELDS_BY_PREFIX.get(filename[:3])
+            if fields is None:
+                print(f"Skipping {filename}: not an RC_/RS_ dump")
+                continue
 
-    os.remove(temp_file_path)  # Delete the temporary file after processing
+            input_file_path = os.path.join(input_dir, filename)
+            output_file_base = os.path.join(output_dir, filename.replace(".zst", ""))
 
-input_dir = "compressed"
-output_dir = "processed"
+            if STREAMING:
+                process_stream(input_file_path, output_file_base, fields)
+            else:
+                temp_file_path = os.path.join(output_dir, filename.replace(".zst", ".temp"))
 
-if not os.path.exists(output_dir):
-    os.makedirs(output_dir)
+                # Decompress to temporary file
+                decompress_to_temp_file(input_file_path, temp_file_path)
 
-for filename in os.listdir(input_dir):
-    if filename.endswith(".zst"):
-        input_file_path = os.path.join(input_dir, filename)
-        temp_file_path = os.path.join(output_dir, filename.replace(".zst", ".temp"))
-        output_file_base = os.path.join(output_dir, filename.replace(".zst", ""))
+                # Process temporary file
+                process_temp_file(temp_file_path, output_file_base, fields)
 
-        # Decompress to temporary file
-        decompress_to_temp_file(input_file_path, temp_file_path)
-        
-        # Process temporary file
-        process_temp_file(temp_file_path, output_file_base)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from schema import arrow_schema, field_converter
+
+ROWS_PER_GROUP = 128 * 1024  # Parquet row group size; statistics are kept per group
+GROUPS_PER_CLUSTER = 16  # Row groups' worth of rows sorted by subreddit together, held as Arrow in memory
+MAX_OPEN_FILES = 16  # A dump covers one month, plus a few stragglers of its neighbours
+PARTITION_COLUMNS = ["month"]
+CLUSTER_COLUMNS = ["subreddit", "created_utc"]
+STATS_COLUMNS = ["created_utc", "subreddit", "author"]
+
+def iter_record_batches(records, fields, schema, progress=None):
+    converters = [field_converter(field) for field in fields]
+    columns = [[] for _ in fields]
+    count = 0
+
+    def flush():
+        arrays = [pa.array(column, type=schema.field(field).type) for column, field in zip(columns, fields)]
+        # month is derived from created_utc so every later stage can prune by month directory
+        month = pc.strftime(arrays[fields.index("created_utc")].cast(pa.timestamp('s')), format="%Y-%m")
+        return pa.RecordBatch.from_arrays(arrays + [month], names=fields + ["month"])
+
+    for record in records:
+        for column, field, convert in zip(columns, fields, converters):
+            column.append(convert(record.get(field)))
+        count += 1
+        if progress and count % 1000 == 0:
+            progress(count / 1000)
+        if len(columns[0]) >= ROWS_PER_GROUP:
+            yield flush()
+            columns = [[] for _ in fields]
+    if columns[0]:
+        yield flush()
+
+def cluster_batches(batches):
+    """Sort every GROUPS_PER_CLUSTER batches by subreddit (then created_utc) and re-cut them into row groups.
+
+    Each row group then holds a narrow run of subreddits, so its min/max statistics let readers skip
+    most groups when filtering on subreddit, without one directory per subreddit.
+    """
+    sort_keys = [(column, "ascending") for column in CLUSTER_COLUMNS]
+    buffered = []
+    for batch in batches:
+        buffered.append(batch)
+        if len(buffered) >= GROUPS_PER_CLUSTER:
+            yield from pa.Table.from_batches(buffered).sort_by(sort_keys).to_batches(max_chunksize=ROWS_PER_GROUP)
+            buffered = []
+    if buffered:
+        yield from pa.Table.from_batches(buffered).sort_by(sort_keys).to_batches(max_chunksize=ROWS_PER_GROUP)
+
+def write_parquet_dataset(records, output_dir, fields, basename, progress=None):
+    """Write parsed dump records as typed Parquet under output_dir/month=YYYY-MM/, clustered by subreddit."""
+    schema = arrow_schema(fields).append(pa.field("month", pa.string()))
+    partitioning = ds.partitioning(
+        pa.schema([schema.field(column) for column in PARTITION_COLUMNS]), flavor="hive"
+    )
+    # Partition columns live in the directory names, so statistics are only written for the rest
+    file_options = ds.ParquetFileFormat().make_write_options(
+        compression="zstd",
+        write_statistics=[column for column in STATS_COLUMNS if column not in PARTITION_COLUMNS],
+    )
+    batches = cluster_batches(iter_record_batches(records, fields, schema, progress))
+    ds.write_dataset(
+        pa.RecordBatchReader.from_batches(schema, batches),
+        output_dir,
+        format="parquet",
+        partitioning=partitioning,
+        file_options=file_options,
+        basename_template=basename + "-{i}.parquet",
+        max_open_files=MAX_OPEN_FILES,
+        min_rows_per_group=ROWS_PER_GROUP,
+        max_rows_per_group=ROWS_PER_GROUP,
+        existing_data_behavior="overwrite_or_ignore",
+    )
@@ -0,0 +1,115 @@
+import os
+import re
+import csv
+import json
+from zst_stream import iter_raw_lines
+
+# Subreddit groups used throughout the project (same lists as DBprocess/DBfilter_bysubreddit_*.py)
+SW_SUBREDDITS = ["SuicideWatch"]
+
+MH_SUBREDDITS = [
+    "depression", "mentalhealth", "traumatoolbox", "BipolarReddit",
+    "BPD", "ptsd", "psychoticreddit", "EatingDisorders", "StopSelfHarm",
+    "survivorsofabuse", "rapecounseling", "hardshipmates",
+    "panicparty", "socialanxiety"
+]
+
+INTERSECTION_SUBREDDITS = [
+    "FindAReddit", "NoStupidQuestions", "offmychest", "WritingPrompts",
+    "self", "lgbt", "explainlikeimfive", "mentalhealth", "raisedbynarcissists",
+    "skyrim", "unpopularopinion", "askwomen", "christianity", "jobs",
+    "outoftheloop", "relationship_advice", "ama", "twoxchromosomes",
+    "askouija", "loseit", "advice", "suicidewatch", "teenagers", "tifu",
+    "askmen", "amitheasshole", "confession", "nofap", "atheism", "copypasta",
+    "relationships", "trueoffmychest", "askdocs", "dating_advice",
+    "casualconversation", "depression", "rant", "sex", "tinder", "drugs",
+    "anxiety", "legaladvice", "tooafraidtoask", "adhd", "tipofmytongue",
+    "askscience"
+]
+
+SUBREDDIT_PRESETS = {
+    "SW": SW_SUBREDDITS,
+    "MH": MH_SUBREDDITS,
+    "intersection": INTERSECTION_SUBREDDITS,
+}
+
+# Subreddit and user names never contain quotes or escapes, so the raw value can be read off the bytes.
+# Nested objects (e.g. crosspost_parent_list) can repeat these keys; the full parse settles those cases.
+SUBREDDIT_PATTERN = re.compile(rb'"subreddit":\s*"([^"\\]*)"')
+AUTHOR_PATTERN = re.compile(rb'"author":\s*"([^"\\]*)"')
+
+def load_names(path, column=None):
+    """Read names from a .csv (first column, or the named one) or a plain file with one name per line."""
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith('.csv'):
+            reader = csv.reader(f)
+            header = next(reader)
+            index = header.index(column) if column else 0
+            return {row[index] for row in reader if len(row) > index and row[index]}
+        return {line.strip() for line in f if line.strip()}
+
+def resolve_subreddits(specs):
+    """Expand preset names (SW, MH, intersection) and list files into one subreddit set."""
+    subreddits = set()
+    for spec in specs:
+        if spec in SUBREDDIT_PRESETS:
+            subreddits.update(SUBREDDIT_PRESETS[spec])
+        elif os.path.exists(spec):
+            subreddits.update(load_names(spec, column="subreddit"))
+        else:
+            subreddits.add(spec)
+    return subreddits
+
+class RecordFilter:
+    """Keeps records whose subreddit is in `subreddits` or whose author is in `authors`.
+
+    Either set may be None. When both are given a record matching either one is kept, so the
+    subreddit extraction and the user-history extraction come out of the same pass.
+    """
+
+    def __init__(self, subreddits=None, authors=None):
+        self.subreddits = {name.lower() for name in subreddits} if subreddits else None
+        self.authors = set(authors) if authors else None
+        self.author_bytes = {name.encode('utf-8') for name in self.authors} if self.authors else None
+        self.scanned = 0
+        self.candidates = 0
+        self.kept = 0
+
+    def is_candidate(self, raw_line):
+        # Cheap byte-level check; may pass false positives but never drops a match
+        if self.subreddits is not None:
+            for value in SUBREDDIT_PATTERN.findall(raw_line):
+                if value.decode('utf-8').lower() in self.subreddits:
+                    return True
+        if self.author_bytes is not None:
+            for value in AUTHOR_PATTERN.findall(raw_line):
+                if value in self.author_bytes:
+                    return True
+        return False
+
+    def matches(self, record):
+        if self.subreddits is not None and str(record.get("subreddit", "")).lower() in self.subreddits:
+            return True
+        if self.authors is not None and record.get("author") in self.authors:
+            return True
+        return False
+
+    def summary(self):
+        return f"scanned {self.scanned}, parsed {self.candidates} candidates, kept {self.kept}"
+
+def iter_records(input_file_path, record_filter=None):
+    """Yield parsed records of a dump, decoding only the lines that pass record_filter's prefilter."""
+    for raw_line in iter_raw_lines(input_file_path):
+        if not raw_line.strip():
+            continue
+        if record_filter is None:
+            yield json.loads(raw_line)
+            continue
+        record_filter.scanned += 1
+        if not record_filter.is_candidate(raw_line):
+            continue
+        record_filter.candidates += 1
+        record = json.loads(raw_line)
+        if record_filter.matches(record):
+            record_filter.kept += 1
+            yield record
@@ -1,26 +1,53 @@
 import sys
+import os
 import csv
-import json
+import argparse
+from prefilter import RecordFilter, iter_records, load_names, resolve_subreddits
+from schema import COMMENT_FIELDS
 
 def print_progress(count):
     sys.stdout.write(f'\rProcessed {count}k comments')
     sys.stdout.flush()
 
-input_file = sys.argv[1]
-output_file = sys.argv[2]
+parser = argparse.ArgumentParser(description="Convert a monthly comments dump (.ndjson or .zst) to CSV or Parquet")
+parser.add_argument("input_file")
+parser.add_argument("output_file", help="CSV file, or output directory with --format parquet")
+parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+parser.add_argument("--subreddits", nargs="+", help="Keep only these subreddits: names, presets (SW, MH, intersection) or list files")
+parser.add_argument("--authors", help="Keep only these authors: .csv with an 'author' column or one name per line")
+args = parser.parse_args()
 
-fields = [
-    "link_id", "parent_id", "created_utc", "subreddit", "author", "body", "score", "is_submitter"
-]
+input_file = args.input_file
+output_file = args.output_file
 
-with open(input_file, 'r', encoding='utf-8') as infile, open(output_file, 'w', newline='', encoding='utf-8') as outfile:
+record_filter = None
+if args.subreddits or args.authors:
+    record_filter = RecordFilter(
+        subreddits=resolve_subreddits(args.subreddits) if args.subreddits else None,
+        authors=load_names(args.authors, column="author") if args.authors else None,
+    )
+
+fields = COMMENT_FIELDS
+
+if args.format == "parquet":
+    from parquet_output import write_parquet_dataset
+    basename = os.path.basename(input_file).split('.')[0]
+    write_parquet_dataset(iter_records(input_file, record_filter), output_file, fields, basename, progress=print_progress)
+    if record_filter:
+        print(f"\n{record_filter.summary()}")
+    sys.exit(0)
+
+# input_file may be the .zst dump itself, which is decoded on the fly
+with open(output_file, 'w', newline='', encoding='utf-8') as outfile:
     writer = csv.DictWriter(outfile, fieldnames=fields, quoting=csv.QUOTE_ALL)
     writer.writeheader()
     count = 0
 
-    for line in infile:
-        comment = json.loads(line.strip())
+    for comment in iter_records(input_file, record_filter):
         writer.writerow({field: comment.get(field, None) for field in fields})
         count += 1
         if count % 1000 == 0:
-            print_progress(count/1000)
\ No newline at end of file
+            print_progress(count/1000)
+
+if record_filter:
+    print(f"\n{record_filter.summary()}")
\ No newline at end of file
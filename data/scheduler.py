@@ -0,0 +1,173 @@
+import os
+import sys
+import json
+import time
+import shutil
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+# Directories (same layout as auto.sh)
+HDD_DIR_COMMENTS = "/mnt/LaCie_2/reddit/comments"
+HDD_DIR_SUBMISSIONS = "/mnt/LaCie_2/reddit/submissions"
+SSD_DIR = "/home/kororu/DMHSS/data"
+HDD_DIR_PROCESSED = "/home/kororu/DMHSS/donefile"
+STATE_FILE = os.path.join(SSD_DIR, "scheduler_state.json")
+
+# Resource budgets
+HDD_READERS = 1  # Concurrent copies off the archive disk; more than one just makes it seek
+CPU_WORKERS = 4  # Concurrent converter processes
+MOVERS = 1  # Concurrent moves of finished output to HDD_DIR_PROCESSED
+SSD_BUDGET_BYTES = 1500 * 1024 ** 3  # SSD space the scheduler may hold at once
+OUTPUT_RATIO = 3.0  # Expected converter output size relative to the compressed input, for SSD reservations
+CONVERT_ARGS = []  # Extra converter arguments, e.g. ["--format", "parquet"] or ["--subreddits", "SW", "MH"]
+
+CONVERTERS = {"RC_": "process_comments.py", "RS_": "process_submissions.py"}
+
+class ByteBudget:
+    """Counting budget in bytes; a single request larger than the whole budget runs alone."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self.condition = threading.Condition()
+
+    def acquire(self, amount):
+        with self.condition:
+            while self.used and self.used + amount > self.limit:
+                self.condition.wait()
+            self.used += amount
+
+    def release(self, amount):
+        with self.condition:
+            self.used -= amount
+            self.condition.notify_all()
+
+class StageStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.totals = {}  # stage -> [bytes, seconds, files]
+
+    def record(self, stage, nbytes, seconds):
+        with self.lock:
+            total = self.totals.setdefault(stage, [0, 0.0, 0])
+            total[0] += nbytes
+            total[1] += seconds
+            total[2] += 1
+
+    def report(self, wall_time):
+        with self.lock:
+            for stage, (nbytes, seconds, files) in self.totals.items():
+                rate = nbytes / seconds / 1024 ** 2 if seconds else 0
+                print(f"  {stage:<8} {files} files, {nbytes / 1024 ** 3:.1f} GB, {rate:.0f} MB/s per file, "
+                      f"busy {seconds:.0f}s ({seconds / wall_time:.1f}x of {wall_time:.0f}s wall)")
+
+class State:
+    """Finished files, persisted after every file so a restarted run skips them."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.done = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.done = json.load(f)
+
+    def is_done(self, filename):
+        return filename in self.done
+
+    def mark_done(self, filename, output_path):
+        with self.lock:
+            self.done[filename] = output_path
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self.done, f)
+            os.replace(tmp_path, self.path)
+
+def path_size(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+    return os.path.getsize(path)
+
+def timed(stats, stage, nbytes_fn, fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    stats.record(stage, nbytes_fn(), time.perf_counter() - start)
+    return result
+
+def run_converter(command):
+    # Converters are run from SSD_DIR like process.sh; their progress output is not interleaved here
+    return subprocess.run(command, check=True, cwd=SSD_DIR, stdout=subprocess.DEVNULL)
+
+def process_file(source_path, semaphores, ssd_budget, stats, state):
+    filename = os.path.basename(source_path)
+    basename = filename[:-len(".zst")]
+    compressed_path = os.path.join(SSD_DIR, "compressed", filename)
+    output_name = basename if "--format" in CONVERT_ARGS else basename + ".csv"
+    output_path = os.path.join(SSD_DIR, "processed", output_name)
+    compressed_size = os.path.getsize(source_path)
+    reservation = int(compressed_size * (1 + OUTPUT_RATIO))
+
+    ssd_budget.acquire(reservation)
+    try:
+        # A copy left by an interrupted run is reused when it is complete
+        if not (os.path.exists(compressed_path) and os.path.getsize(compressed_path) == compressed_size):
+            with semaphores["copy"]:
+                timed(stats, "copy", lambda: compressed_size, shutil.copyfile, source_path, compressed_path)
+
+        with semaphores["convert"]:
+            command = [sys.executable, CONVERTERS[filename[:3]], compressed_path, output_path] + CONVERT_ARGS
+            timed(stats, "convert", lambda: compressed_size, run_converter, command)
+
+        with semaphores["move"]:
+            output_size = path_size(output_path)
+            final_path = os.path.join(HDD_DIR_PROCESSED, output_name)
+            timed(stats, "move", lambda: output_size, shutil.move, output_path, final_path)
+
+        os.remove(compressed_path)
+        state.mark_done(filename, final_path)
+        print(f"Finished {filename}")
+    finally:
+        ssd_budget.release(reservation)
+
+def main():
+    for directory in ("compressed", "processed"):
+        os.makedirs(os.path.join(SSD_DIR, directory), exist_ok=True)
+    os.makedirs(HDD_DIR_PROCESSED, exist_ok=True)
+
+    state = State(STATE_FILE)
+    sources = []
+    for directory in (HDD_DIR_COMMENTS, HDD_DIR_SUBMISSIONS):
+        sources += [os.path.join(directory, name) for name in sorted(os.listdir(directory)) if name.endswith(".zst")]
+    # Interleave months so comment and submission files of the same month run side by side
+    sources.sort(key=lambda path: os.path.basename(path)[3:])
+    pending = [path for path in sources if not state.is_done(os.path.basename(path))]
+    print(f"{len(sources) - len(pending)} files already done, {len(pending)} to go")
+
+    semaphores = {
+        "copy": threading.Semaphore(HDD_READERS),
+        "convert": threading.Semaphore(CPU_WORKERS),
+        "move": threading.Semaphore(MOVERS),
+    }
+    ssd_budget = ByteBudget(SSD_BUDGET_BYTES)
+    stats = StageStats()
+    start = time.perf_counter()
+
+    # Enough jobs in flight to keep every stage busy; the semaphores do the actual limiting
+    with ThreadPoolExecutor(max_workers=HDD_READERS + CPU_WORKERS + MOVERS + 1) as executor:
+        futures = {executor.submit(process_file, path, semaphores, ssd_budget, stats, state): path for path in pending}
+        failed = []
+        for future, path in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Failed {os.path.basename(path)}: {e}")
+                failed.append(path)
+
+    print("Stage throughput:")
+    stats.report(time.perf_counter() - start)
+    if failed:
+        print(f"{len(failed)} files failed and will be retried on the next run")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import sys
+from datetime import datetime, timezone
+
+sys.set_int_max_str_digits(40000)
+
+# Fields kept from the archive, in output column order
+COMMENT_FIELDS = [
+    "link_id", "parent_id", "created_utc", "subreddit", "author", "body", "score", "is_submitter"
+]
+SUBMISSION_FIELDS = [
+    "id", "created_utc", "subreddit", "author", "title", "selftext", "score", "num_comments"
+]
+
+# Dump file name prefix -> field list
+FIELDS_BY_PREFIX = {
+    "RC_": COMMENT_FIELDS,
+    "RS_": SUBMISSION_FIELDS,
+}
+
+# Non-string fields; everything else is stored as a string
+FIELD_TYPES = {
+    "created_utc": "int",
+    "score": "int",
+    "num_comments": "int",
+    "is_submitter": "bool",
+}
+
+def to_int(value):
+    # Older dumps store some numbers as strings (e.g. created_utc "1136074600")
+    if value is None or value == "":
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        try:
+            return int(float(value))
+        except (TypeError, ValueError):
+            return None
+
+def to_bool(value):
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        return value.lower() == "true"
+    return bool(value)
+
+def to_str(value):
+    return None if value is None else str(value)
+
+CONVERTERS = {"int": to_int, "bool": to_bool, "str": to_str}
+
+def field_converter(field):
+    return CONVERTERS[FIELD_TYPES.get(field, "str")]
+
+def typed_document(items):
+    """Build a document from (field, value) pairs with schema types plus created_day/month."""
+    doc = {field: field_converter(field)(value) for field, value in items}
+    created_utc = doc.get("created_utc")
+    if created_utc is not None:
+        created = datetime.fromtimestamp(created_utc, timezone.utc)
+        doc["created_day"] = created.strftime('%Y-%m-%d')
+        doc["month"] = created.strftime('%Y-%m')
+    return doc
+
+def arrow_schema(fields):
+    """pyarrow schema for the given field list (pyarrow is only needed for columnar output)."""
+    import pyarrow as pa
+    arrow_types = {"int": pa.int64(), "bool": pa.bool_(), "str": pa.string()}
+    return pa.schema([(field, arrow_types[FIELD_TYPES.get(field, "str")]) for field in fields])
@@ -0,0 +1,56 @@
+import io
+import zstandard as zstd
+
+# Reddit archive dumps are compressed with --long=31, so the decoder needs a 2GB window
+MAX_WINDOW_SIZE = 2 ** 31
+READ_SIZE = 2 ** 24  # Compressed bytes pulled from disk per read
+BUFFER_SIZE = 2 ** 22  # Decompressed bytes buffered for raw line splitting
+
+def iter_zst_lines(input_file_path):
+    """Yield decoded lines of a .zst ndjson dump without writing it to disk."""
+    with open(input_file_path, 'rb') as fh:
+        dctx = zstd.ZstdDecompressor(max_window_size=MAX_WINDOW_SIZE)
+        with dctx.stream_reader(fh, read_size=READ_SIZE) as reader:
+            # TextIOWrapper keeps partial UTF-8 sequences between reads, unlike per-chunk decode()
+            text = io.TextIOWrapper(reader, encoding='utf-8', newline='')
+            for line in text:
+                yield line
+
+def iter_lines(input_file_path):
+    """Yield lines of an ndjson file, streaming straight from the archive when it is compressed."""
+    if input_file_path.endswith('.zst'):
+        yield from iter_zst_lines(input_file_path)
+    else:
+        with open(input_file_path, 'r', encoding='utf-8') as f:
+            yield from f
+
+def iter_zst_raw_lines(input_file_path):
+    """Yield undecoded byte lines of a .zst dump; a newline byte never occurs inside a UTF-8 sequence."""
+    with open(input_file_path, 'rb') as fh:
+        dctx = zstd.ZstdDecompressor(max_window_size=MAX_WINDOW_SIZE)
+        with dctx.stream_reader(fh, read_size=READ_SIZE) as reader:
+            yield from io.BufferedReader(reader, buffer_size=BUFFER_SIZE)
+
+def iter_raw_lines(input_file_path):
+    """Byte-line counterpart of iter_lines, for callers that look at lines before decoding them."""
+    if input_file_path.endswith('.zst'):
+        yield from iter_zst_raw_lines(input_file_path)
+    else:
+        with open(input_file_path, 'rb') as f:
+            yield from f
+
+def iter_zst_raw_lines_with_offsets(input_file_path, start_offset=0):
+    """Yield (line, decompressed offset after the line, compressed bytes read so far) from a .zst dump.
+
+    A zstd frame can't be entered in the middle, so resuming at start_offset decodes and discards
+    everything before it; that skips at decompression speed without any per-line work.
+    """
+    with open(input_file_path, 'rb') as fh:
+        dctx = zstd.ZstdDecompressor(max_window_size=MAX_WINDOW_SIZE)
+        with dctx.stream_reader(fh, read_size=READ_SIZE) as reader:
+            if start_offset:
+                reader.seek(start_offset)
+            offset = start_offset
+            for line in io.BufferedReader(reader, buffer_size=BUFFER_SIZE):
+                offset += len(line)
+                yield line, offset, fh.tell()
@@ -0,0 +1,137 @@
+import os
+import sys
+import json
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pymongo.errors import BulkWriteError
+from pymongo.write_concern import WriteConcern
+from tqdm import tqdm
+from zst_stream import iter_zst_raw_lines_with_offsets
+from schema import FIELDS_BY_PREFIX, typed_document
+from prefilter import RecordFilter, load_names, resolve_subreddits
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from reddit_db import get_db, close_client, WRITE_BATCH_SIZE
+
+### Hyperparameters and Configurations ###
+COLLECTION_BY_PREFIX = {"RC_": "comments", "RS_": "submissions"}
+STATE_FILE = "zst_to_mongo_state.json"
+NUM_INSERTERS = 4  # Concurrent insert_many calls; pymongo releases the GIL while waiting on the server
+MAX_PENDING_BATCHES = NUM_INSERTERS * 2
+WRITE_CONCERN = WriteConcern(w=1, j=False)
+
+def load_state(state_file):
+    if os.path.exists(state_file):
+        with open(state_file, 'r') as f:
+            return json.load(f)
+    return {}
+
+def save_state(state_file, state):
+    tmp_file = state_file + ".tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_file, state_file)
+
+def insert_batch(collection, docs):
+    try:
+        collection.insert_many(docs, ordered=False)
+        return len(docs), 0
+    except BulkWriteError as e:
+        errors = len(e.details.get("writeErrors", []))
+        return len(docs) - errors, errors
+
+def load_file(input_file, collection, record_filter, state, state_file):
+    name = os.path.basename(input_file)
+    fields = FIELDS_BY_PREFIX[name[:3]]
+    file_state = state.setdefault(name, {"decompressed_offset": 0, "compressed_offset": 0, "inserted": 0})
+    if file_state.get("completed"):
+        print(f"Skipping {name} as it has already been loaded.")
+        return
+
+    batch = []
+    pending = deque()  # (future, decompressed offset, compressed offset) in submission order
+    write_errors = 0
+    start = time.perf_counter()
+    inserted_at_start = file_state["inserted"]
+
+    def drain_one():
+        # Futures are drained in order, so the saved offset never passes an unfinished batch
+        nonlocal write_errors
+        future, decompressed_offset, compressed_offset = pending.popleft()
+        inserted, errors = future.result()
+        write_errors += errors
+        file_state["inserted"] += inserted
+        file_state["decompressed_offset"] = decompressed_offset
+        file_state["compressed_offset"] = compressed_offset
+        save_state(state_file, state)
+
+    with ThreadPoolExecutor(max_workers=NUM_INSERTERS) as executor, \
+            tqdm(total=os.path.getsize(input_file), initial=file_state["compressed_offset"],
+                 unit="B", unit_scale=True, desc=name) as pbar:
+        compressed_seen = file_state["compressed_offset"]
+        lines = iter_zst_raw_lines_with_offsets(input_file, file_state["decompressed_offset"])
+        for raw_line, decompressed_offset, compressed_offset in lines:
+            if compressed_offset != compressed_seen:
+                pbar.update(compressed_offset - compressed_seen)
+                compressed_seen = compressed_offset
+            if not raw_line.strip():
+                continue
+            if record_filter is not None:
+                record_filter.scanned += 1
+                if not record_filter.is_candidate(raw_line):
+                    continue
+                record_filter.candidates += 1
+            record = json.loads(raw_line)
+            if record_filter is not None:
+                if not record_filter.matches(record):
+                    continue
+                record_filter.kept += 1
+
+            batch.append(typed_document((field, record.get(field)) for field in fields))
+            if len(batch) >= WRITE_BATCH_SIZE:
+                pending.append((executor.submit(insert_batch, collection, batch), decompressed_offset, compressed_offset))
+                batch = []
+                if len(pending) >= MAX_PENDING_BATCHES:
+                    drain_one()
+
+        if batch:
+            pending.append((executor.submit(insert_batch, collection, batch), decompressed_offset, compressed_offset))
+        while pending:
+            drain_one()
+
+    file_state["completed"] = True
+    save_state(state_file, state)
+    elapsed = time.perf_counter() - start
+    inserted = file_state["inserted"] - inserted_at_start
+    print(f"{name}: inserted {inserted} docs in {elapsed:.1f}s ({inserted / elapsed if elapsed else 0:,.0f} docs/sec), "
+          f"{write_errors} write errors")
+    if record_filter is not None:
+        print(f"{name}: {record_filter.summary()}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream RC_/RS_ .zst dumps straight into MongoDB")
+    parser.add_argument("input_files", nargs="+")
+    parser.add_argument("--collection", help="Target collection (default: comments/submissions by file prefix)")
+    parser.add_argument("--subreddits", nargs="+", help="Subreddit names, presets (SW, MH, intersection) or list files")
+    parser.add_argument("--authors", help=".csv with an 'author' column or one name per line")
+    parser.add_argument("--state-file", default=STATE_FILE)
+    args = parser.parse_args()
+
+    db = get_db()
+    state = load_state(args.state_file)
+    subreddits = resolve_subreddits(args.subreddits) if args.subreddits else None
+    authors = load_names(args.authors, column="author") if args.authors else None
+
+    for input_file in args.input_files:
+        # A fresh filter per file so the scanned/kept counts are reported per month
+        record_filter = RecordFilter(subreddits, authors) if subreddits or authors else None
+        collection_name = args.collection or COLLECTION_BY_PREFIX[os.path.basename(input_file)[:3]]
+        collection = db[collection_name].with_options(write_concern=WRITE_CONCERN)
+        load_file(input_file, collection, record_filter, state, args.state_file)
+
+    close_client()
+
+if __name__ == "__main__":
+    main()
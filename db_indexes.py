@@ -0,0 +1,198 @@
+import argparse
+from pymongo import ASCENDING
+from reddit_db import get_db, close_client
+
+# Collections used by the pipeline stages (see the *_COLLECTION constants of each script)
+FULL_COMMENTS = 'comments'
+FULL_SUBMISSIONS = 'submissions'
+STANDARD_COMMENTS = 'filtered_comments_standard'
+STANDARD_SUBMISSIONS = 'filtered_submissions_standard'
+SCORE2_COMMENTS = 'filtered_comments_score2'
+SCORE2_SUBMISSIONS = 'filtered_submissions_score2'
+RELEVANT_COMMENTS = 'relevant_comments'
+RELEVANT_SUBMISSIONS = 'relevant_submissions'
+
+def index(collection, keys, **options):
+    return {'collection': collection, 'keys': [(field, ASCENDING) for field in keys], 'options': options}
+
+def query(collection, filter=None, pipeline=None):
+    return {'collection': collection, 'filter': filter, 'pipeline': pipeline}
+
+# Indexes each stage needs, and queries shaped like the ones the stage runs (values are placeholders;
+# only their shape matters to the planner). Compound indexes list equality fields before ranges.
+STAGES = {
+    # DBprocess/DBfilter_byuserID_*, models/score*.py, analysis/Extraction*.py: per-author lookups
+    'extract': {
+        'indexes': [
+            index(FULL_COMMENTS, ['author']),
+            index(FULL_SUBMISSIONS, ['author']),
+            index(FULL_COMMENTS, ['created_utc']),
+            index(FULL_SUBMISSIONS, ['created_utc']),
+        ],
+        'queries': [
+            query(FULL_COMMENTS, {'author': {'$in': ['user_a', 'user_b']}}),
+            query(FULL_SUBMISSIONS, {'author': 'user_a'}),
+        ],
+    },
+    # DBprocess/moving_sentiment.py: copies scores matched on (created_utc, author)
+    'migrate': {
+        'indexes': [
+            index(STANDARD_COMMENTS, ['created_utc', 'author']),
+            index(STANDARD_SUBMISSIONS, ['created_utc', 'author']),
+        ],
+        'queries': [
+            query(STANDARD_COMMENTS, {'created_utc': {'$in': [1, 2]}, 'author': {'$in': ['user_a']}}),
+        ],
+    },
+    # models/score_new.py, analysis/step1_sentiment_score.py: per-author score totals
+    'score': {
+        'indexes': [
+            index(SCORE2_COMMENTS, ['author']),
+            index(SCORE2_SUBMISSIONS, ['author']),
+            index(SCORE2_COMMENTS, ['subreddit']),
+            index(SCORE2_SUBMISSIONS, ['subreddit']),
+        ],
+        'queries': [
+            query(SCORE2_COMMENTS, pipeline=[{'$match': {'author': 'user_a'}}]),
+        ],
+    },
+    # analysis/step2_analyze.py: samples per (user_grp, subreddit_grp)
+    'step2': {
+        'indexes': [
+            index(STANDARD_COMMENTS, ['user_grp', 'subreddit_grp']),
+            index(STANDARD_SUBMISSIONS, ['user_grp', 'subreddit_grp']),
+        ],
+        'queries': [
+            query(STANDARD_COMMENTS, {'user_grp': 'SW', 'subreddit_grp': 'MH'}),
+            query(STANDARD_SUBMISSIONS, {'user_grp': 'SW', 'subreddit_grp': 'MH'}),
+        ],
+    },
+    # analysis/step3_*: per (author, month) updates, and comm_score thresholds over scored documents only
+    'step3': {
+        'indexes': [
+            index(STANDARD_COMMENTS, ['author', 'created_day']),
+            index(STANDARD_SUBMISSIONS, ['author', 'created_day']),
+            index(STANDARD_COMMENTS, ['comm_score'], partialFilterExpression={'comm_score': {'$exists': True}}),
+            index(STANDARD_SUBMISSIONS, ['comm_score'], partialFilterExpression={'comm_score': {'$exists': True}}),
+        ],
+        'queries': [
+            query(STANDARD_COMMENTS, {'author': 'user_a', 'created_day': {'$regex': '^2020-01'}}),
+            query(STANDARD_COMMENTS, pipeline=[{'$match': {'comm_score': {'$exists': True}}}]),
+        ],
+    },
+    # analysis/step4_*: per (author, subreddit_grp, month); a ^-anchored created_day $regex is an index
+    # range only when created_day is part of the index, otherwise it is a scan of every author document
+    'step4': {
+        'indexes': [
+            index(STANDARD_COMMENTS, ['author', 'subreddit_grp', 'created_day']),
+            index(STANDARD_SUBMISSIONS, ['author', 'subreddit_grp', 'created_day']),
+            index(STANDARD_SUBMISSIONS, ['user_grp', 'author']),
+        ],
+        'queries': [
+            query(STANDARD_COMMENTS, {'author': 'user_a', 'subreddit_grp': 'SW', 'created_day': {'$regex': '^2020-01-'}}),
+            query(STANDARD_SUBMISSIONS, {'author': 'user_a', 'subreddit_grp': 'SW', 'created_day': {'$regex': '^2020-01-'}}),
+            query(STANDARD_SUBMISSIONS, pipeline=[{'$match': {'user_grp': 'SW'}}, {'$group': {'_id': '$author'}}]),
+        ],
+    },
+    # analysis/group_tagger.py, analysis_new/*: group tagging and group ratios; the user_grp and
+    # subreddit_grp prefixes also find the untagged ({$exists: false}) documents of a new load
+    'groups': {
+        'indexes': [
+            index(RELEVANT_COMMENTS, ['author']),
+            index(RELEVANT_SUBMISSIONS, ['author']),
+            index(RELEVANT_COMMENTS, ['user_grp', 'subreddit_grp']),
+            index(RELEVANT_SUBMISSIONS, ['user_grp', 'subreddit_grp']),
+            index(RELEVANT_COMMENTS, ['subreddit_grp']),
+            index(RELEVANT_SUBMISSIONS, ['subreddit_grp']),
+            index(RELEVANT_COMMENTS, ['subreddit']),
+            index(RELEVANT_SUBMISSIONS, ['subreddit']),
+        ],
+        'queries': [
+            query(RELEVANT_COMMENTS, pipeline=[{'$match': {'user_grp': 'SW'}}]),
+            query(RELEVANT_SUBMISSIONS, {'author': 'user_a'}),
+            query(RELEVANT_COMMENTS, {'user_grp': {'$exists': False}}),
+        ],
+    },
+}
+
+def key_pattern(keys):
+    return tuple((field, int(direction)) for field, direction in keys)
+
+def ensure_indexes(db, stage):
+    """Create the stage's indexes; ones whose key pattern already exists (under any name) are left alone."""
+    created = existing = 0
+    for spec in STAGES[stage]['indexes']:
+        collection = db[spec['collection']]
+        patterns = {key_pattern(info['key']) for info in collection.index_information().values()}
+        if key_pattern(spec['keys']) in patterns:
+            existing += 1
+            continue
+        name = collection.create_index(spec['keys'], **spec['options'])
+        print(f"[{stage}] Created {spec['collection']}.{name}")
+        created += 1
+    print(f"[{stage}] {created} indexes created, {existing} already present")
+
+def find_nodes(plan, match):
+    """Yield every node of an explain() document (dicts at any depth) for which match(node) is true."""
+    if isinstance(plan, dict):
+        if match(plan):
+            yield plan
+        for value in plan.values():
+            yield from find_nodes(value, match)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from find_nodes(item, match)
+
+def is_collscan(explained):
+    # Only the winning plans count; rejected plans often include a COLLSCAN candidate
+    winning_plans = [node['winningPlan'] for node in find_nodes(explained, lambda node: 'winningPlan' in node)]
+    return any(find_nodes(winning_plans, lambda node: node.get('stage') == 'COLLSCAN'))
+
+def explain(db, spec):
+    if spec['pipeline'] is not None:
+        command = {'aggregate': spec['collection'], 'pipeline': spec['pipeline'], 'cursor': {}}
+    else:
+        command = {'find': spec['collection'], 'filter': spec['filter']}
+    return db.command('explain', command, verbosity='queryPlanner')
+
+def check_queries(db, stage):
+    """explain() the stage's representative queries and return the ones that would scan the whole collection."""
+    scans = []
+    for spec in STAGES[stage]['queries']:
+        plan = explain(db, spec)
+        shape = spec['pipeline'] if spec['pipeline'] is not None else spec['filter']
+        if is_collscan(plan):
+            scans.append(spec)
+            print(f"[{stage}] COLLSCAN on {spec['collection']}: {shape}")
+        else:
+            print(f"[{stage}] ok {spec['collection']}: {shape}")
+    return scans
+
+def prepare_stage(db, stage):
+    """Call at the start of a long job: build the stage's indexes and warn about remaining scans."""
+    ensure_indexes(db, stage)
+    scans = check_queries(db, stage)
+    if scans:
+        print(f"[{stage}] Warning: {len(scans)} representative queries scan a whole collection")
+    return scans
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the indexes each pipeline stage needs and check its query plans")
+    parser.add_argument('stages', nargs='*', default=list(STAGES), help=f"Stages to prepare (default: all of {', '.join(STAGES)})")
+    parser.add_argument('--check-only', action='store_true', help="Only run explain(), don't build indexes")
+    args = parser.parse_args()
+
+    db = get_db()
+    scans = []
+    for stage in args.stages:
+        if not args.check_only:
+            ensure_indexes(db, stage)
+        scans.extend(check_queries(db, stage))
+    close_client()
+
+    if scans:
+        raise SystemExit(f"{len(scans)} representative queries still scan a whole collection; fix before starting the job")
+    print("No collection scans in the representative queries.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import torch
+
+# Constants
+BUCKET_SIZE = 32  # Texts per forward pass; lower it if a bucket of long texts runs out of VRAM
+
+def iter_batches(iterable, batch_size):
+    """Yield lists of up to batch_size items (e.g. documents from a cursor)."""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def length_buckets(lengths, bucket_size):
+    """Indices grouped into buckets of up to bucket_size texts of similar token length, shortest first."""
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    return [order[start:start + bucket_size] for start in range(0, len(order), bucket_size)]
+
+def predict_probabilities(model, tokenizer, device, texts, bucket_size=BUCKET_SIZE, **tokenizer_options):
+    """Softmax label probabilities of every text, in input order.
+
+    The texts are tokenized once, sorted by token length and cut into buckets, so each forward pass
+    pads only up to the longest text of its bucket instead of the longest text of the batch. Results
+    are the same as scoring each text alone with get_label_probabilities.
+    """
+    texts = list(texts)
+    if not texts:
+        return []
+    encodings = tokenizer(texts, truncation=True, **tokenizer_options)
+    lengths = [len(ids) for ids in encodings["input_ids"]]
+    probs = [None] * len(texts)
+    for bucket in length_buckets(lengths, bucket_size):
+        features = [{name: encodings[name][i] for name in encodings.keys()} for i in bucket]
+        inputs = tokenizer.pad(features, return_tensors='pt')
+        inputs = {name: tensor.to(device) for name, tensor in inputs.items()}
+        with torch.no_grad():
+            outputs = model(**inputs)
+        bucket_probs = torch.nn.functional.softmax(outputs.logits, dim=-1).cpu().numpy()
+        for i, row in zip(bucket, bucket_probs):
+            probs[i] = row
+    return probs
+
+def predict_submissions(predict_batch, titles, selftexts, empty=0, score_empty_titles=True):
+    """(title, selftext, combined) scores of each submission from a single predict_batch call.
+
+    Every title (or, with score_empty_titles=False, every non-empty title), the non-empty selftexts,
+    and title + " " + selftext where both are non-empty are scored together, so all three fields of
+    every submission in the batch share one set of length buckets. When one part is empty the combined
+    text is just the other part, so it takes that part's score instead of being scored again. Empty
+    selftexts (and unscored titles) score `empty`.
+    """
+    texts = []
+    positions = {}
+    for i, (title, selftext) in enumerate(zip(titles, selftexts)):
+        parts = {"title": title, "selftext": selftext}
+        if title.strip() and selftext.strip():
+            parts["combined"] = title + " " + selftext
+        for field, text in parts.items():
+            if text.strip() or (field == "title" and score_empty_titles):
+                positions[i, field] = len(texts)
+                texts.append(text)
+    scores = predict_batch(texts)
+
+    def score(i, field):
+        return scores[positions[i, field]] if (i, field) in positions else empty
+
+    def combined_score(i):
+        if (i, "combined") in positions:
+            return score(i, "combined")
+        return score(i, "selftext" if selftexts[i].strip() else "title")
+
+    n = len(titles)
+    return ([score(i, "title") for i in range(n)],
+            [score(i, "selftext") for i in range(n)],
+            [combined_score(i) for i in range(n)])
@@ -0,0 +1,80 @@
+import argparse
+import importlib
+import tempfile
+import time
+import numpy as np
+import inference_cache
+from tqdm import tqdm
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from reddit_db import get_db, close_client
+
+### Hyperparameters and Configurations ###
+MODEL_MODULE = "kaggle_model_1"  # kaggle_model_1, kaggle_model_2 or depression
+COLLECTION_NAME = "filtered_comments_standard"
+TEXT_FIELD = "body"
+NUM_DOCS = 2000  # Documents scored by each path
+BUCKET_SIZES = [8, 32, 64]  # Texts per forward pass to try on the batched path
+
+def load_texts(collection_name, field, n):
+    collection = get_db()[collection_name]
+    return [str(doc.get(field, "")) for doc in collection.aggregate([{"$sample": {"size": n}}, {"$project": {field: 1}}])]
+
+def padded_tokens(tokenizer, texts, bucket_size, bucketed):
+    """Tokens fed to the model (including padding) when the texts are batched bucket_size at a time."""
+    lengths = [len(ids) for ids in tokenizer(texts, truncation=True)["input_ids"]]
+    if bucketed:
+        lengths = sorted(lengths)
+    return sum(max(lengths[i:i + bucket_size]) * len(lengths[i:i + bucket_size]) for i in range(0, len(lengths), bucket_size))
+
+def main():
+    parser = argparse.ArgumentParser(description="docs/sec of per-document vs length-bucketed batched inference")
+    parser.add_argument("--model", default=MODEL_MODULE)
+    parser.add_argument("--collection", default=COLLECTION_NAME)
+    parser.add_argument("--field", default=TEXT_FIELD)
+    parser.add_argument("-n", type=int, default=NUM_DOCS)
+    args = parser.parse_args()
+
+    model_module = importlib.import_module(args.model)
+    model_module.initialize_model()
+    texts = load_texts(args.collection, args.field, args.n)
+    close_client()
+    print(f"{len(texts)} texts from {args.collection}.{args.field}, model {model_module.model_name} on {model_module.device}")
+
+    # The bucketed runs below measure inference, not cache lookups
+    inference_cache.enabled = False
+
+    # Warm up so CUDA initialization isn't counted against the first path
+    model_module.get_label_probabilities_batch(texts[:8])
+
+    start = time.perf_counter()
+    single = [model_module.get_label_probabilities(text) for text in tqdm(texts, desc="Per document")]
+    single_rate = len(texts) / (time.perf_counter() - start)
+    print(f"Per document: {single_rate:.1f} docs/sec")
+
+    unpadded = padded_tokens(model_module.tokenizer, texts, 1, False)
+    for bucket_size in BUCKET_SIZES:
+        start = time.perf_counter()
+        batched = model_module.get_label_probabilities_batch(texts, bucket_size=bucket_size)
+        rate = len(texts) / (time.perf_counter() - start)
+        max_diff = float(np.max(np.abs(np.array(single, dtype=float) - np.array(batched, dtype=float))))
+        unsorted = padded_tokens(model_module.tokenizer, texts, bucket_size, False)
+        bucketed = padded_tokens(model_module.tokenizer, texts, bucket_size, True)
+        print(f"Bucketed, {bucket_size} per pass: {rate:.1f} docs/sec ({rate / single_rate:.1f}x), "
+              f"max |diff| {max_diff:.2e}, padding {unsorted / unpadded - 1:.0%} unsorted vs {bucketed / unpadded - 1:.0%} bucketed")
+
+    # Through a scratch inference cache: the cold pass only saves on texts repeated within the sample
+    with tempfile.TemporaryDirectory() as cache_dir:
+        inference_cache.CACHE_FILE = os.path.join(cache_dir, "inference_cache.sqlite")
+        inference_cache.enabled = True
+        for label in ["cold", "warm"]:
+            start = time.perf_counter()
+            model_module.get_label_probabilities_batch(texts)
+            rate = len(texts) / (time.perf_counter() - start)
+            print(f"Bucketed with {label} cache: {rate:.1f} docs/sec ({rate / single_rate:.1f}x)")
+        inference_cache.report()
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 import torch
+from batch_inference import predict_probabilities, BUCKET_SIZE
+from inference_cache import cached_probabilities, model_revision
 
 model_name = 'j-hartmann/emotion-english-distilroberta-base'
 model = AutoModelForSequenceClassification.from_pretrained(model_name)
@@ -27,6 +29,15 @@ def get_emotion_probabilities(text):
     probs = probs.cpu().numpy()[0]
     return probs.tolist()  # [anger, disgust, fear, joy, neutral, sadness, surprise]
 
+def get_emotion_probabilities_batch(texts, bucket_size=BUCKET_SIZE):
+    if model is None or tokenizer is None:
+        initialize_model()
+
+    # Same as get_emotion_probabilities for each text, but one forward pass per bucket of similar-length texts,
+    # and only for texts that are not in the inference cache yet
+    predict = lambda batch: predict_probabilities(model, tokenizer, device, batch, bucket_size, max_length=512)
+    return [probs.tolist() for probs in cached_probabilities(model_name, model_revision(model), texts, predict)]
+
 
 # If this file is run as a script, demonstrate the model initialization and a test run.
 if __name__ == "__main__":
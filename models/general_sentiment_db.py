@@ -1,15 +1,24 @@
 import multiprocessing as mp
 mp.set_start_method('spawn', force=True)
 
-from pymongo import MongoClient
 from tqdm import tqdm
 from multiprocessing import Pool
+from batch_inference import iter_batches
+import inference_cache
 import general_sentiment  # Ensure this module is in your PYTHONPATH or in the same directory
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bulk_writer import BulkWriter
+from reddit_db import get_db
+from work_queue import create_job, leased_ranges, finish_job
 
 ### Hyperparameters and Configurations ###
-DB_NAME = "reddit"
 COLLECTION_NAME = "relevant_submissions"
 COLLECTION_TYPE = "S"  # 'C' for comments, 'S' for submissions
+BATCH_SIZE = 64  # Adjust based on available VRAM and model size
+JOB_NAME = f"emotion:{COLLECTION_NAME}"  # Lease bookkeeping in work_leases; see work_queue.py
 NUM_WORKERS = 4 # Number of parallel processes for data fetching
 
 def get_text(doc):
@@ -21,41 +30,39 @@ def get_text(doc):
         return (title + " " + selftext).strip()
 
 def process_batch(batch):
-    emotion_scores_batch = []
-
-    for doc in batch:
-        text = get_text(doc)
-        if text:
-            emotion_scores = general_sentiment.get_emotion_probabilities(text)
-            emotion_scores_batch.append((doc["_id"], emotion_scores))
-    
-    return emotion_scores_batch
-
-def process_chunk(worker_id, total_workers):
-    local_client = MongoClient()
-    local_db = local_client[DB_NAME]
+    texts = [(doc["_id"], get_text(doc)) for doc in batch]
+    texts = [(doc_id, text) for doc_id, text in texts if text]
+    emotion_scores = general_sentiment.get_emotion_probabilities_batch([text for _, text in texts])
+    return [(doc_id, scores) for (doc_id, _), scores in zip(texts, emotion_scores)]
+
+def process_chunk(worker_id):
+    local_db = get_db()
     local_collection = local_db[COLLECTION_NAME]
 
     query = {"emotion_scores": {"$exists": False}}
-    cursor = local_collection.find(query)
     processed_count = 0
 
-    for i, doc in enumerate(tqdm(cursor, desc=f"Worker {worker_id}", position=worker_id)):
-        if i % total_workers != worker_id:
-            continue
-
-        batch = process_batch([doc])
-        for doc_id, emotion_scores in batch:
-            update = {"$set": {"emotion_scores": emotion_scores}}
-            local_collection.update_one({"_id": doc_id}, update)
-            processed_count += 1
-
-    local_client.close()
+    # Scores go to a background writer that sends them in unordered bulk writes
+    with BulkWriter(local_collection) as writer:
+        # Each worker reads only the _id range it holds the lease on
+        for id_range in leased_ranges(JOB_NAME):
+            cursor = local_collection.find({**query, **id_range})
+            for batch in iter_batches(tqdm(cursor, desc=f"Worker {worker_id}", position=worker_id, leave=False), BATCH_SIZE):
+                for doc_id, emotion_scores in process_batch(batch):
+                    writer.update(doc_id, {"emotion_scores": emotion_scores})
+                    processed_count += 1
+            # Scores of the range must be in Mongo before its lease is marked done
+            writer.flush()
     print(f"Worker {worker_id} processed {processed_count} documents")
+    inference_cache.report()
 
 def main():
+    # Split the collection into _id ranges that the workers lease one at a time; after a crash,
+    # running the script again only processes the ranges that were not finished
+    create_job(get_db()[COLLECTION_NAME], JOB_NAME)
     with Pool(NUM_WORKERS) as pool:
-        pool.starmap(process_chunk, [(worker_id, NUM_WORKERS) for worker_id in range(NUM_WORKERS)])
+        pool.map(process_chunk, range(NUM_WORKERS))
+    finish_job(JOB_NAME)
 
 if __name__ == "__main__":
     main()
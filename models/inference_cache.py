@@ -0,0 +1,110 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import unicodedata
+from collections import Counter
+import numpy as np
+
+# Scores of every model, keyed by (model name, model revision, hash of the normalized text).
+# Override the location with INFERENCE_CACHE=/path/to/cache.sqlite, or turn it off with INFERENCE_CACHE=off;
+# delete the file to start over.
+CACHE_FILE = os.environ.get("INFERENCE_CACHE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "inference_cache.sqlite"))
+enabled = CACHE_FILE != "off"
+LOOKUP_CHUNK = 500  # Keys per SELECT ... IN (...), below SQLite's parameter limit
+
+_conn = None
+_conn_pid = None
+_lock = threading.Lock()
+stats = Counter()  # Per "model:revision": lookups, hits and scored (texts sent to the model) in this process
+
+def _forget_connection():
+    # A forked child must not share the parent's SQLite handle, and counts its own hits
+    global _conn, _conn_pid, _lock
+    _conn, _conn_pid = None, None
+    _lock = threading.Lock()
+    stats.clear()
+
+os.register_at_fork(after_in_child=_forget_connection)
+
+def get_connection():
+    global _conn, _conn_pid
+    if _conn is None or _conn_pid != os.getpid():
+        # WAL lets the Pool workers read while one of them writes; timeout waits out the others' writes
+        _conn = sqlite3.connect(CACHE_FILE, timeout=60, check_same_thread=False)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("PRAGMA synchronous=NORMAL")
+        _conn.execute("""CREATE TABLE IF NOT EXISTS scores (
+            model TEXT NOT NULL, revision TEXT NOT NULL, text_hash BLOB NOT NULL, probs BLOB NOT NULL,
+            PRIMARY KEY (model, revision, text_hash)) WITHOUT ROWID""")
+        _conn_pid = os.getpid()
+    return _conn
+
+def normalize_text(text):
+    """The text that is hashed for the cache key: Unicode NFC without surrounding whitespace."""
+    return unicodedata.normalize("NFC", str(text)).strip()
+
+def text_hash(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+def model_revision(model):
+    """Commit of the loaded weights, so scores of an updated model are not served from the cache."""
+    return getattr(model.config, "_commit_hash", None) or "unknown"
+
+def lookup(model_name, revision, hashes):
+    conn = get_connection()
+    found = {}
+    hashes = list(hashes)
+    for start in range(0, len(hashes), LOOKUP_CHUNK):
+        chunk = hashes[start:start + LOOKUP_CHUNK]
+        rows = conn.execute(
+            f"SELECT text_hash, probs FROM scores WHERE model = ? AND revision = ? AND text_hash IN ({','.join('?' * len(chunk))})",
+            [model_name, revision, *chunk])
+        for key, probs in rows:
+            found[key] = np.frombuffer(probs, dtype=np.float32)
+    return found
+
+def store(model_name, revision, scored):
+    conn = get_connection()
+    with conn:
+        conn.executemany("INSERT OR IGNORE INTO scores VALUES (?, ?, ?, ?)",
+                         [(model_name, revision, key, np.asarray(probs, dtype=np.float32).tobytes()) for key, probs in scored.items()])
+
+def cached_probabilities(model_name, revision, texts, predict_batch):
+    """predict_batch(texts) with every text looked up in the cache first.
+
+    Only texts that are neither cached nor repeated earlier in the same call reach predict_batch, so a
+    batch full of "[deleted]" costs one forward pass the first time and none after that. The normalized
+    text is only the cache key: the model is given the text as it was passed in (the first one of
+    those sharing a key).
+    """
+    if not enabled:
+        return list(predict_batch(texts))
+    texts = list(texts)
+    hashes = [text_hash(normalize_text(text)) for text in texts]
+    # The lock guards the shared connection; inference runs outside it so threads don't wait on each other
+    with _lock:
+        found = lookup(model_name, revision, set(hashes))
+    missing = {}
+    for key, text in zip(hashes, texts):
+        if key not in found and key not in missing:
+            missing[key] = text
+    if missing:
+        scored = dict(zip(missing, predict_batch(list(missing.values()))))
+        with _lock:
+            store(model_name, revision, scored)
+        found.update({key: np.asarray(probs, dtype=np.float32) for key, probs in scored.items()})
+
+    name = f"{model_name}:{revision}"
+    with _lock:
+        stats[name + ":lookups"] += len(hashes)
+        stats[name + ":hits"] += len(hashes) - len(missing)
+        stats[name + ":scored"] += len(missing)
+    return [found[key] for key in hashes]
+
+def report():
+    """Print the hit rate of each model used by this process."""
+    for name in sorted({key.rsplit(":", 1)[0] for key in stats}):
+        lookups, hits, scored = stats[name + ":lookups"], stats[name + ":hits"], stats[name + ":scored"]
+        rate = hits / lookups if lookups else 0
+        print(f"Inference cache [{name}] (pid {os.getpid()}): {hits}/{lookups} texts served from cache ({rate:.1%}), {scored} scored")
@@ -1,5 +1,7 @@
 from transformers import ElectraTokenizer, ElectraForSequenceClassification
 import torch
+from batch_inference import predict_probabilities, BUCKET_SIZE
+from inference_cache import cached_probabilities, model_revision
 
 model_name = 'gooohjy/suicidal-electra'
 model = None
@@ -34,3 +36,12 @@ def get_label_probabilities(text):
     probs = probs.cpu().numpy()[0]
     
     return probs
+
+def get_label_probabilities_batch(texts, bucket_size=BUCKET_SIZE):
+    if model is None or tokenizer is None:
+        initialize_model()
+
+    # Same as get_label_probabilities for each text, but one forward pass per bucket of similar-length texts,
+    # and only for texts that are not in the inference cache yet
+    predict = lambda batch: predict_probabilities(model, tokenizer, device, batch, bucket_size)
+    return cached_probabilities(model_name, model_revision(model), texts, predict)
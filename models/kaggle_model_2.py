@@ -1,5 +1,7 @@
 from transformers import RobertaTokenizer, RobertaForSequenceClassification
 import torch
+from batch_inference import predict_probabilities, BUCKET_SIZE
+from inference_cache import cached_probabilities, model_revision
 
 model_name = 'mrm8488/distilroberta-base-finetuned-suicide-depression'
 model = None
@@ -28,3 +30,12 @@ def get_label_probabilities(text):
     
     # Returning the probability of label 1 (suicide)
     return [probs[0], probs[1]]  # [label_0_score, label_1_score]
+
+def get_label_probabilities_batch(texts, bucket_size=BUCKET_SIZE):
+    if model is None or tokenizer is None:
+        initialize_model()
+
+    # Same as get_label_probabilities for each text, but one forward pass per bucket of similar-length texts,
+    # and only for texts that are not in the inference cache yet
+    predict = lambda batch: predict_probabilities(model, tokenizer, device, batch, bucket_size)
+    return [[probs[0], probs[1]] for probs in cached_probabilities(model_name, model_revision(model), texts, predict)]
@@ -1,10 +1,13 @@
-import pymongo
 import csv
 from collections import defaultdict
 from tqdm import tqdm
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from reddit_db import get_db
 
 ### Hyperparameters and Configurations ###
-DB_NAME = "reddit"
 OUTPUT_FILE = "low500_suicide2_full.csv" # internal/external/total
 
 # Collection names
@@ -25,8 +28,7 @@ TOP_N = 500
 ORDER = "ascending"
 
 # Establish connection
-client = pymongo.MongoClient()
-db = client[DB_NAME]
+db = get_db()
 
 # Fetch users and their integrated scores
 users_scores = defaultdict(lambda: [0.0, 0])  # [total_score, weighted_count]
@@ -1,9 +1,13 @@
-import pymongo
 import csv
 from tqdm import tqdm
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from reddit_db import get_db
+from shard_runner import run_sharded
 
 ### Hyperparameters and Configurations ###
-DB_NAME = "reddit"
 OUTPUT_FILE = "low500_score2_full.csv"  # internal/external/total
 
 # Collection names
@@ -24,10 +28,10 @@ TOP_N = 500
 ORDER = "ascending"
 
 # Establish connection
-client = pymongo.MongoClient()
-db = client[DB_NAME]
+db = get_db()
 
-# MongoDB aggregation pipeline to calculate total scores and counts
+# MongoDB aggregation pipeline to calculate total scores and counts, run as concurrent _id range
+# shards whose per-author partial sums are combined into <collection>_author_totals
 def calculate_total_scores_and_counts(collection, weight, score_field):
     pipeline = [
         {"$match": {"author": {"$ne": "[deleted]"}}},
@@ -37,7 +41,9 @@ def calculate_total_scores_and_counts(collection, weight, score_field):
             "total_weighted_count": {"$sum": weight}
         }}
     ]
-    return {doc["_id"]: doc for doc in db[collection].aggregate(pipeline, allowDiskUse=True)}
+    output = f"{collection}_author_totals"
+    run_sharded(collection, pipeline, output, combine=True)
+    return {doc["_id"]: doc for doc in db[output].find()}
 
 # Calculate total scores and counts for submissions and comments
 submissions_data = calculate_total_scores_and_counts(COLLECTION_SUBMISSIONS, SUBMISSION_WEIGHT, 'sentiment_score_complex')
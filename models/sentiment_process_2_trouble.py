@@ -1,47 +1,57 @@
-from pymongo import MongoClient
-from depression import get_label_probabilities  # Replace with your actual sentiment analysis model
+from depression import get_label_probabilities_batch  # Replace with your actual sentiment analysis model
 from tqdm import tqdm
-from multiprocessing import Pool, current_process
+from multiprocessing import Pool
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from batch_inference import iter_batches, predict_submissions
+import inference_cache
+from bulk_writer import BulkWriter
+from reddit_db import get_db, close_client
+from work_queue import create_job, leased_ranges, finish_job
 
 ### Hyperparameters and Configurations ###
-DB_NAME = "reddit"
 COLLECTION_NAME = "relevant_submissions"
 COLLECTION_TYPE = "S"  # 'C' for comments, 'S' for submissions
+BATCH_SIZE = 80  # Adjust based on available VRAM and model size
+JOB_NAME = f"sentiment:{COLLECTION_NAME}"  # Lease bookkeeping in work_leases; see work_queue.py
 NUM_WORKERS = 2  # Number of parallel processes for data fetching
 
+def sentiment_scores(texts):
+    return [probs[0] for probs in get_label_probabilities_batch(texts)]
+
 def process_comment_batch(batch):
-    sentiment_scores = []
-    for doc in batch:
-        text = str(doc.get("body", ""))
-        sentiment_prob = get_label_probabilities(text)[0]
-        sentiment_scores.append(sentiment_prob)
-    return sentiment_scores
+    return sentiment_scores([str(doc.get("body", "")) for doc in batch])
 
 def process_submission_batch(batch):
-    title_sentiment_scores = []
-    selftext_sentiment_scores = []
-    combined_sentiment_scores = []
-
-    for doc in batch:
-        title = doc.get("title", "")  
-        selftext = doc.get("selftext", "")  
-
-        title = str(title) if title else ""
-        selftext = str(selftext) if selftext else ""
-
-        title_sentiment_prob = get_label_probabilities(title)[0]
-        selftext_sentiment_prob = get_label_probabilities(selftext)[0] if selftext.strip() else 0
-        combined_sentiment_prob = get_label_probabilities(title + " " + selftext)[0]
-
-        title_sentiment_scores.append(title_sentiment_prob)
-        selftext_sentiment_scores.append(selftext_sentiment_prob)
-        combined_sentiment_scores.append(combined_sentiment_prob)
-
-    return title_sentiment_scores, selftext_sentiment_scores, combined_sentiment_scores
-
-def process_chunk(worker_id, total_workers):
-    local_client = MongoClient()
-    local_db = local_client[DB_NAME]
+    # Ensure both title and selftext are strings (empty if missing)
+    titles = [str(doc.get("title", "")) if doc.get("title", "") else "" for doc in batch]
+    selftexts = [str(doc.get("selftext", "")) if doc.get("selftext", "") else "" for doc in batch]
+
+    # Title, selftext and title + selftext of the whole batch go through the model in one call
+    return predict_submissions(sentiment_scores, titles, selftexts)
+
+def update_batch(writer, batch):
+    if COLLECTION_TYPE == "C":
+        for doc, score in zip(batch, process_comment_batch(batch)):
+            writer.update(doc["_id"], {"sentiment_score": float(score)})
+    else:
+        title_scores, selftext_scores, combined_scores = process_submission_batch(batch)
+        for doc, title_score, selftext_score, combined_score in zip(batch, title_scores, selftext_scores, combined_scores):
+            writer.update(doc["_id"], {
+                "sentiment_score_title": float(title_score),
+                "sentiment_score_text": float(selftext_score),
+                "sentiment_score_complex": float(combined_score)
+            })
+
+def is_scored(doc):
+    if COLLECTION_TYPE == "C":
+        return "sentiment_score" in doc
+    return all(key in doc for key in ["sentiment_score_title", "sentiment_score_text", "sentiment_score_complex"])
+
+def process_chunk(worker_id):
+    local_db = get_db()
     local_collection = local_db[COLLECTION_NAME]
 
     query = {"sentiment_score": {"$exists": False}} if COLLECTION_TYPE == "C" else {
@@ -52,51 +62,43 @@ def process_chunk(worker_id, total_workers):
         ]
     }
 
-    cursor = local_collection.find(query)
     processed_count = 0
 
-    for i, doc in enumerate(tqdm(cursor, desc=f"Worker {worker_id}", position=worker_id)):
-        if i % total_workers != worker_id:
-            continue  # Skip documents that are not assigned to this worker
-
-        # Add debugging information
-        print(f"Processing document {doc['_id']} - Sentiment Fields Present: {any(key in doc for key in ['sentiment_score', 'sentiment_score_title', 'sentiment_score_text', 'sentiment_score_complex'])}")
+    def range_docs(cursor):
+        for doc in tqdm(cursor, desc=f"Worker {worker_id}", position=worker_id, leave=False):
+            # Add debugging information
+            print(f"Processing document {doc['_id']} - Sentiment Fields Present: {any(key in doc for key in ['sentiment_score', 'sentiment_score_title', 'sentiment_score_text', 'sentiment_score_complex'])}")
 
-        # Additional check for each document to see if sentiment scores are already set
-        if COLLECTION_TYPE == "C":
-            if "sentiment_score" in doc:
+            if is_scored(doc):
                 continue  # Skip this document as it's already processed
-        else:
-            if all(key in doc for key in ["sentiment_score_title", "sentiment_score_text", "sentiment_score_complex"]):
-                continue  # Skip this document as it's already processed
-
-        # Processing logic
-        if COLLECTION_TYPE == "C":
-            score = process_comment_batch([doc])[0]
-            local_collection.update_one({"_id": doc["_id"]}, {"$set": {"sentiment_score": float(score)}})
-        else:
-            title_score, selftext_score, combined_score = process_submission_batch([doc])
-            local_collection.update_one({"_id": doc["_id"]}, {"$set": {
-                "sentiment_score_title": float(title_score[0]),
-                "sentiment_score_text": float(selftext_score[0]),
-                "sentiment_score_complex": float(combined_score[0])
-            }})
-
-        processed_count += 1
-
-    local_client.close()
+            yield doc
+
+    # Scores go to a background writer that sends them in unordered bulk writes
+    with BulkWriter(local_collection) as writer:
+        # Each worker reads only the _id range it holds the lease on
+        for id_range in leased_ranges(JOB_NAME):
+            cursor = local_collection.find({**query, **id_range})
+            for batch in iter_batches(range_docs(cursor), BATCH_SIZE):
+                update_batch(writer, batch)
+                processed_count += len(batch)
+            # Scores of the range must be in Mongo before its lease is marked done
+            writer.flush()
     print(f"Worker {worker_id} processed {processed_count} documents")
+    inference_cache.report()
 
 def main():
+    # Split the collection into _id ranges that the workers lease one at a time; after a crash,
+    # running the script again only processes the ranges that were not finished
+    create_job(get_db()[COLLECTION_NAME], JOB_NAME)
     with Pool(NUM_WORKERS) as pool:
-        pool.starmap(process_chunk, [(worker_id, NUM_WORKERS) for worker_id in range(NUM_WORKERS)])
+        pool.map(process_chunk, range(NUM_WORKERS))
+    finish_job(JOB_NAME)
 
 if __name__ == "__main__":
-    client = MongoClient()
-    db = client[DB_NAME]
+    db = get_db()
     collection = db[COLLECTION_NAME]
 
     main()
 
-    client.close()
+    close_client()
     print("Finished processing.")
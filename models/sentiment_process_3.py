@@ -1,93 +1,91 @@
-from pymongo import MongoClient
-# from kaggle_model_1 import get_label_probabilities # kaggle_model_1
+# from kaggle_model_1 import get_label_probabilities_batch # kaggle_model_1
 # from twitter_sentiment import get_label_probabilities # twitter model
-from kaggle_model_2 import get_label_probabilities # kaggle_model_2
+from kaggle_model_2 import get_label_probabilities_batch # kaggle_model_2
 from tqdm import tqdm
-from multiprocessing import Pool, current_process
+from multiprocessing import Pool
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from batch_inference import iter_batches, predict_submissions
+import inference_cache
+from bulk_writer import BulkWriter
+from reddit_db import get_db, close_client
+from work_queue import create_job, leased_ranges, finish_job
 
 ### Hyperparameters and Configurations ###
-DB_NAME = "reddit"
 COLLECTION_NAME = "SW_comments_score2"
 COLLECTION_TYPE = "C"  # 'C' for comments, 'S' for submissions
 BATCH_SIZE = 80  # Adjust based on available VRAM and model size
+JOB_NAME = f"sentiment:{COLLECTION_NAME}"  # Lease bookkeeping in work_leases; see work_queue.py
 NUM_WORKERS = 4  # Number of parallel processes for data fetching
 
-client = MongoClient()
-db = client[DB_NAME]
+db = get_db()
 collection = db[COLLECTION_NAME]
 
+def sentiment_scores(texts):
+    return [probs[1] for probs in get_label_probabilities_batch(texts)]
+
 def process_comment_batch(batch):
-    sentiment_scores = []
-    for doc in batch:
-        text = str(doc.get("body", ""))
-        sentiment_prob = get_label_probabilities(text)[1]
-        sentiment_scores.append(sentiment_prob)
-    return sentiment_scores
+    return sentiment_scores([str(doc.get("body", "")) for doc in batch])
 
 def process_submission_batch(batch):
-    title_sentiment_scores = []
-    selftext_sentiment_scores = []
-    combined_sentiment_scores = []
-
-    for doc in batch:
-        title = doc.get("title", "")  # Default to empty string if missing
-        selftext = doc.get("selftext", "")  # Default to empty string if missing
-
-        # Ensure both title and selftext are strings
-        title = str(title) if title else ""
-        selftext = str(selftext) if selftext else ""
-
-        title_sentiment_prob = get_label_probabilities(title)[1]
-        selftext_sentiment_prob = get_label_probabilities(selftext)[1] if selftext.strip() else 0
-        combined_sentiment_prob = get_label_probabilities(title + " " + selftext)[1]
-
-        title_sentiment_scores.append(title_sentiment_prob)
-        selftext_sentiment_scores.append(selftext_sentiment_prob)
-        combined_sentiment_scores.append(combined_sentiment_prob)
-
-    return title_sentiment_scores, selftext_sentiment_scores, combined_sentiment_scores
-
-def process_chunk(chunk_start, chunk_end):
-    local_client = MongoClient()
-    local_db = local_client[DB_NAME]
+    # Ensure both title and selftext are strings (empty if missing)
+    titles = [str(doc.get("title", "")) if doc.get("title", "") else "" for doc in batch]
+    selftexts = [str(doc.get("selftext", "")) if doc.get("selftext", "") else "" for doc in batch]
+
+    # Title, selftext and title + selftext of the whole batch go through the model in one call
+    return predict_submissions(sentiment_scores, titles, selftexts)
+
+def update_batch(writer, batch):
+    if COLLECTION_TYPE == "C":
+        for doc, score in zip(batch, process_comment_batch(batch)):
+            writer.update(doc["_id"], {"sentiment_score": float(score)})
+    else:
+        title_scores, selftext_scores, combined_scores = process_submission_batch(batch)
+        for doc, title_score, selftext_score, combined_score in zip(batch, title_scores, selftext_scores, combined_scores):
+            writer.update(doc["_id"], {
+                "sentiment_score_title": float(title_score),
+                "sentiment_score_text": float(selftext_score),
+                "sentiment_score_complex": float(combined_score)
+            })
+
+def process_chunk(worker_id):
+    local_db = get_db()
     local_collection = local_db[COLLECTION_NAME]
-    cursor = local_collection.find({}).skip(chunk_start).limit(chunk_end - chunk_start)
-
-    # Using tqdm with postfix to identify which process is providing updates
-    for doc in tqdm(cursor, desc=f"Process {current_process().name}", position=int(current_process().name.split('-')[-1])):
-        if COLLECTION_TYPE == "C":
-            score = process_comment_batch([doc])[0]
-            local_collection.update_one({"_id": doc["_id"]}, {"$set": {"sentiment_score": float(score)}})
-        else:
-            title_score, selftext_score, combined_score = process_submission_batch([doc])
-            local_collection.update_one({"_id": doc["_id"]}, {"$set": {
-                "sentiment_score_title": float(title_score[0]),
-                "sentiment_score_text": float(selftext_score[0]),
-                "sentiment_score_complex": float(combined_score[0])
-            }})
-
-    local_client.close()
-
-# Calculate the number of documents to process per worker
-total_docs = collection.count_documents({})
-docs_per_worker = total_docs // NUM_WORKERS
-
-# Create a list of (start, end) indices for each chunk
-chunks = [(i, min(i + docs_per_worker, total_docs)) for i in range(0, total_docs, docs_per_worker)]
-
-# Process each chunk in parallel
-with Pool(NUM_WORKERS) as pool:
-    results = pool.starmap(process_chunk, chunks)
 
-# Check for None results and handle them
-cleaned_results = [res for res in results if res is not None]
-
-# Flatten the cleaned results
-flat_results = [item for sublist in cleaned_results for item in sublist]
+    # Only documents without their scores, so a reclaimed or resumed range doesn't score them again
+    query = {"sentiment_score": {"$exists": False}} if COLLECTION_TYPE == "C" else {
+        "$or": [
+            {"sentiment_score_title": {"$exists": False}},
+            {"sentiment_score_text": {"$exists": False}},
+            {"sentiment_score_complex": {"$exists": False}}
+        ]
+    }
+
+    # Scores go to a background writer that sends them in unordered bulk writes
+    with BulkWriter(local_collection) as writer:
+        # Each worker reads only the _id range it holds the lease on
+        for id_range in leased_ranges(JOB_NAME):
+            cursor = local_collection.find({**query, **id_range})
+            for batch in iter_batches(tqdm(cursor, desc=f"Worker {worker_id}", position=worker_id, leave=False), BATCH_SIZE):
+                update_batch(writer, batch)
+            # Scores of the range must be in Mongo before its lease is marked done
+            writer.flush()
+    inference_cache.report()
+
+
+# Split the collection into _id ranges that the workers lease one at a time; after a crash,
+# running the script again only processes the ranges that were not finished
+create_job(collection, JOB_NAME)
+
+# Process the ranges in parallel
+with Pool(NUM_WORKERS) as pool:
+    pool.map(process_chunk, range(NUM_WORKERS))
 
-# TODO: Store the results or perform further processing
+finish_job(JOB_NAME)
 
 # Close the main connection
-client.close()
+close_client()
 
 print("Finished processing.")
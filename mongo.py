@@ -1,29 +1,45 @@
 import pandas as pd
 import csv
-from pymongo import MongoClient
+import hashlib
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+from pymongo.write_concern import WriteConcern
 import os
+import time
 import warnings
 import json
+from collections import deque
+from multiprocessing import Pool
 from tqdm import tqdm
+from data.schema import typed_document
+from reddit_db import get_db
 
 # Constants
 WORKLOAD_DIR = "./workload.now"
 CHECKPOINT_FILE = os.path.join(WORKLOAD_DIR, "checkpoint.txt")
 SKIP_FILE = os.path.join(WORKLOAD_DIR, "skip.txt")
-DB_NAME = "reddit"
 CHUNK_SIZE = 1000  # Reduced CHUNK_SIZE for memory considerations
+CHECKPOINT_EVERY = 1  # Write a checkpoint after this many inserted chunks
+NUM_LOADERS = os.cpu_count()  # Loader processes, each with its own connection
+MAX_PENDING_CHUNKS = NUM_LOADERS * 4  # Chunks in flight before the reader waits
+TYPED = True  # Convert fields with data/schema.py types and add created_day/month
+WRITE_CONCERN = WriteConcern(w=1, j=False)  # Raise to w="majority"/j=True for stronger durability
 
-# Establish connection to MongoDB
-client = MongoClient()
-db = client[DB_NAME]
+# Connection of each loader process, opened by init_loader
+db = None
+
+def init_loader():
+    global db
+    db = get_db()
 
 def is_file_completed(file_path, checkpoints):
     return checkpoints.get(file_path, {}).get("completed", False)
 
 def get_checkpoint(file_path, checkpoints):
-    return checkpoints.get(file_path, {}).get("rows_processed", 0)
+    checkpoint = checkpoints.get(file_path, {})
+    return checkpoint.get("rows_processed", 0), checkpoint.get("byte_offset")
 
-def update_checkpoint(file_path, rows_processed, completed=False):
+def update_checkpoint(file_path, rows_processed, completed=False, byte_offset=None):
     checkpoints = {}
     if os.path.exists(CHECKPOINT_FILE):
         with open(CHECKPOINT_FILE, 'r') as f:
@@ -32,8 +48,64 @@ def update_checkpoint(file_path, rows_processed, completed=False):
         checkpoints[file_path] = {}
     checkpoints[file_path]["rows_processed"] = rows_processed
     checkpoints[file_path]["completed"] = completed
-    with open(CHECKPOINT_FILE, 'w') as f:
+    if byte_offset is not None:
+        checkpoints[file_path]["byte_offset"] = byte_offset
+    # Write to a temp file and swap it in so a crash never leaves a truncated checkpoint
+    tmp_file = CHECKPOINT_FILE + ".tmp"
+    with open(tmp_file, 'w') as f:
         json.dump(checkpoints, f)
+    os.replace(tmp_file, CHECKPOINT_FILE)
+
+class OffsetLineReader:
+    """Yields decoded lines of a binary file while tracking the byte offset of everything handed out."""
+
+    def __init__(self, f):
+        self.f = f
+        self.offset = f.tell()
+
+    def __iter__(self):
+        for raw_line in self.f:
+            self.offset += len(raw_line)
+            if b'\x00' in raw_line:
+                continue
+            yield raw_line.decode('utf-8')
+
+def file_key(file_path):
+    return hashlib.blake2b(os.path.basename(file_path).encode('utf-8'), digest_size=4).digest()
+
+def row_id(key, offset):
+    """Deterministic _id of the row that starts at byte offset of the file with file_key key.
+
+    A chunk that is inserted again after a resume gets the same _ids, so the server rejects the
+    copies as duplicate keys instead of storing them twice.
+    """
+    return ObjectId(key + offset.to_bytes(8, 'big'))
+
+def convert_row(header, row):
+    if not TYPED:
+        return dict(zip(header, row))
+    return typed_document(zip(header, row))
+
+def insert_chunk(collection_name, header, rows, key, offsets):
+    # Runs in a loader process
+    start = time.perf_counter()
+    collection = db[collection_name].with_options(write_concern=WRITE_CONCERN)
+    docs = []
+    for row, offset in zip(rows, offsets):
+        doc = convert_row(header, row)
+        doc["_id"] = row_id(key, offset)
+        docs.append(doc)
+    errors = duplicates = 0
+    try:
+        # Unordered: the server applies the batch in parallel and a bad document doesn't stop the rest
+        collection.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        for error in e.details.get("writeErrors", []):
+            if error.get("code") == 11000:
+                duplicates += 1  # Already loaded before a resume
+            else:
+                errors += 1
+    return len(docs) - duplicates, errors, duplicates, time.perf_counter() - start
 
 def log_skipped_rows(file_path, count):
     with open(SKIP_FILE, "a") as f:
@@ -44,9 +116,11 @@ def process_file(file_path, collection_name, checkpoints):
         print(f"Skipping {file_path} as it has already been processed.")
         return
 
-    collection = db[collection_name]
-    rows_processed = get_checkpoint(file_path, checkpoints)
+    rows_processed, byte_offset = get_checkpoint(file_path, checkpoints)
     warnings_count = 0
+    write_errors = 0
+    duplicates = 0
+    key = file_key(file_path)
 
     # Custom warning handler to count the number of warnings
     def warn_count(*args, **kwargs):
@@ -54,42 +128,83 @@ def process_file(file_path, collection_name, checkpoints):
         warnings_count += 1
         return warnings.showwarning(*args, **kwargs)
 
-    # Open the CSV file and set up a CSV reader
-    with open(file_path, 'r', encoding='utf-8') as f:
-        filtered_lines = (line for line in f if '\x00' not in line)
-        reader = csv.reader(filtered_lines)
-        
+    # Read the file in binary so the offset after every row is known; csv.reader only pulls
+    # the lines it needs for each row, so lines.offset always sits at a row boundary.
+    with open(file_path, 'rb') as f, Pool(NUM_LOADERS, initializer=init_loader) as pool:
+        lines = OffsetLineReader(f)
+        reader = csv.reader(iter(lines))
+
         # Read the header
         header = next(reader)
 
-        # Skip any previously processed rows
-        for _ in range(rows_processed):
-            next(reader)
-
-        with warnings.catch_warnings(record=True):
+        if byte_offset is not None:
+            # Jump straight to the last committed chunk
+            f.seek(byte_offset)
+            lines.offset = byte_offset
+        else:
+            # Old checkpoints only have a row count
+            for _ in range(rows_processed):
+                next(reader)
+
+        start = time.perf_counter()
+        docs_loaded = 0
+        # (async result, rows read up to the end of the chunk, byte offset after the chunk)
+        pending = deque()
+        chunks_since_checkpoint = 0
+
+        def drain_one():
+            # Chunks are drained in submission order, so a checkpoint never skips an unfinished chunk
+            nonlocal chunks_since_checkpoint, docs_loaded, write_errors, duplicates
+            result, chunk_rows, chunk_offset = pending.popleft()
+            n_docs, n_errors, n_duplicates, _ = result.get()
+            docs_loaded += n_docs
+            write_errors += n_errors
+            duplicates += n_duplicates
+            pbar.update(n_docs + n_duplicates)
+            chunks_since_checkpoint += 1
+            if chunks_since_checkpoint >= CHECKPOINT_EVERY:
+                update_checkpoint(file_path, chunk_rows, byte_offset=chunk_offset)
+                chunks_since_checkpoint = 0
+
+        with warnings.catch_warnings(record=True), \
+                tqdm(desc=f"Processing {file_path}", initial=rows_processed, unit=" docs") as pbar:
             warnings.showwarning = warn_count
 
-            # Process rows in chunks and insert each chunk into MongoDB
-            chunk = []
-            for row in tqdm(reader, desc=f"Processing {file_path}"):
-                # Convert row to dictionary
-                row_dict = dict(zip(header, row))
-                chunk.append(row_dict)
-                
-                if len(chunk) == CHUNK_SIZE:
-                    collection.insert_many(chunk)
-                    chunk = []
+            # Read rows in chunks and hand each chunk to a loader process. Up to MAX_PENDING_CHUNKS
+            # chunks are in flight past the checkpoint, and after a crash they are inserted again;
+            # their _ids come from the byte offset of each row, so the copies are rejected.
+            chunk, offsets = [], []
+            row_start = lines.offset
+            for row in reader:
+                chunk.append(row)
+                offsets.append(row_start)
+                row_start = lines.offset
                 rows_processed += 1
 
+                if len(chunk) == CHUNK_SIZE:
+                    pending.append((pool.apply_async(insert_chunk, (collection_name, header, chunk, key, offsets)),
+                                    rows_processed, lines.offset))
+                    chunk, offsets = [], []
+                    if len(pending) >= MAX_PENDING_CHUNKS:
+                        drain_one()
+
             # Insert any remaining rows from the last chunk
             if chunk:
-                collection.insert_many(chunk)
+                pending.append((pool.apply_async(insert_chunk, (collection_name, header, chunk, key, offsets)),
+                                rows_processed, lines.offset))
+            while pending:
+                drain_one()
+
+        elapsed = time.perf_counter() - start
+        print(f"Loaded {docs_loaded} docs into {collection_name} in {elapsed:.1f}s "
+              f"({docs_loaded / elapsed if elapsed else 0:,.0f} docs/sec), {write_errors} write errors, "
+              f"{duplicates} already loaded before a resume")
 
         # Log the number of skipped rows to skip.txt for every file
-        log_skipped_rows(file_path, warnings_count)
+        log_skipped_rows(file_path, warnings_count + write_errors)
 
         # Update the checkpoint to indicate completion
-        update_checkpoint(file_path, rows_processed, completed=True)
+        update_checkpoint(file_path, rows_processed, completed=True, byte_offset=lines.offset)
 
 def main():
     csv.field_size_limit(2147483647)  # Set to maximum possible value
@@ -0,0 +1,142 @@
+import os
+import json
+import time
+import threading
+from bson import json_util
+from pymongo import MongoClient, ASCENDING
+from pymongo.errors import CursorNotFound, AutoReconnect, NetworkTimeout
+
+# Connection settings shared by every script; override the file with REDDIT_DB_CONFIG=/path/to/config.json
+CONFIG_FILE = os.environ.get("REDDIT_DB_CONFIG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "db_config.json"))
+DEFAULTS = {
+    "uri": "mongodb://localhost:27017/",
+    "db_name": "reddit",
+    "max_pool_size": 32,  # Connections per process; threads of one process share them
+    "min_pool_size": 0,
+    "read_preference": "primary",  # e.g. "secondaryPreferred" to keep long analysis reads off a replica set primary
+    "server_selection_timeout_ms": 30000,
+    "socket_timeout_ms": None,
+    "cursor_batch_size": 5000,  # Documents per getMore for long scans
+    "write_batch_size": 5000,  # Documents per insert_many / bulk_write
+    "max_cursor_retries": 10,  # Reopens in a row without progress before iter_documents gives up
+    "checkpoint_every": 10000,  # Documents between saves of the last _id in iter_documents
+}
+
+def load_config(path=CONFIG_FILE):
+    config = dict(DEFAULTS)
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            config.update(json.load(f))
+    return config
+
+config = load_config()
+DB_NAME = config["db_name"]
+CURSOR_BATCH_SIZE = config["cursor_batch_size"]
+WRITE_BATCH_SIZE = config["write_batch_size"]
+MAX_CURSOR_RETRIES = config["max_cursor_retries"]
+CHECKPOINT_EVERY = config["checkpoint_every"]
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+def _forget_client():
+    # A forked child must not reuse the parent's sockets; it builds its own client on first use
+    global _client, _client_pid, _client_lock
+    _client, _client_pid = None, None
+    _client_lock = threading.Lock()
+
+os.register_at_fork(after_in_child=_forget_client)
+
+def get_client():
+    """The pooled MongoClient of the current process, created on first use.
+
+    Safe with fork and spawn Pool workers: each process gets its own client, shared by its threads.
+    """
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        with _client_lock:
+            if _client is None or _client_pid != os.getpid():
+                _client = MongoClient(
+                    config["uri"],
+                    maxPoolSize=config["max_pool_size"],
+                    minPoolSize=config["min_pool_size"],
+                    readPreference=config["read_preference"],
+                    serverSelectionTimeoutMS=config["server_selection_timeout_ms"],
+                    socketTimeoutMS=config["socket_timeout_ms"],
+                )
+                _client_pid = os.getpid()
+    return _client
+
+def get_db(name=None):
+    return get_client()[name or DB_NAME]
+
+def close_client():
+    global _client, _client_pid
+    with _client_lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client, _client_pid = None, None
+
+def load_last_id(state_file):
+    if state_file and os.path.exists(state_file):
+        with open(state_file, 'r') as f:
+            return json_util.loads(f.read())["last_id"]
+    return None
+
+def save_last_id(state_file, last_id):
+    tmp_file = state_file + ".tmp"
+    with open(tmp_file, 'w') as f:
+        f.write(json_util.dumps({"last_id": last_id}))
+    os.replace(tmp_file, state_file)
+
+def iter_documents(collection, filter=None, projection=None, state_file=None, batch_size=None):
+    """Yield the documents matching filter in _id order, surviving cursor timeouts and reconnects.
+
+    When the server drops the cursor (CursorNotFound after cursorTimeoutMillis, a restart, a network
+    error) the query is reopened from the last _id handed out, so no no_cursor_timeout or raised
+    cursorTimeoutMillis is needed. With state_file, the last _id whose document the caller has
+    finished with is saved every CHECKPOINT_EVERY documents and when the scan is interrupted, and a
+    new run starts after it. A scan that reaches the end deletes the state file, so the next run starts
+    from the beginning again.
+    """
+    filter = filter or {}
+    batch_size = batch_size or CURSOR_BATCH_SIZE
+    last_id = load_last_id(state_file)
+    if last_id is not None:
+        print(f"Resuming {collection.name} after _id {last_id}")
+    retries = 0
+    since_checkpoint = 0
+
+    completed = False
+    try:
+        while True:
+            query = {"$and": [filter, {"_id": {"$gt": last_id}}]} if last_id is not None else filter
+            cursor = collection.find(query, projection, sort=[("_id", ASCENDING)], batch_size=batch_size)
+            try:
+                for doc in cursor:
+                    # The caller is done with the previous document once it asks for the next one
+                    yield doc
+                    last_id = doc["_id"]
+                    retries = 0
+                    since_checkpoint += 1
+                    if state_file and since_checkpoint >= CHECKPOINT_EVERY:
+                        save_last_id(state_file, last_id)
+                        since_checkpoint = 0
+                break
+            except (CursorNotFound, AutoReconnect, NetworkTimeout) as e:
+                retries += 1
+                if retries > MAX_CURSOR_RETRIES:
+                    raise
+                print(f"Cursor on {collection.name} lost ({type(e).__name__}); reopening after _id {last_id} (retry {retries})")
+                time.sleep(min(2 ** retries, 60))
+            finally:
+                cursor.close()
+        completed = True
+    finally:
+        if state_file and completed:
+            if os.path.exists(state_file):
+                os.remove(state_file)
+        elif state_file and last_id is not None:
+            # Stopped early (an exception, or the caller stopped iterating): keep the place for the next run
+            save_last_id(state_file, last_id)
@@ -0,0 +1,145 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from bson import json_util
+from tqdm import tqdm
+from reddit_db import get_db
+
+# Constants
+NUM_SHARDS = 64  # More shards than workers keeps every worker busy and makes a failed shard cheap to re-run
+NUM_WORKERS = 8  # Shards aggregated at once
+SAMPLE_SIZE = 5000  # Shard key values sampled to place the shard boundaries
+STATE_DIR = "./shard_state"
+
+# Accumulators that can be applied again to combine per-shard partial results
+COMBINABLE = {"$sum", "$min", "$max"}
+
+def shard_bounds(collection, shard_key, num_shards):
+    """Split points of shard_key giving shards of roughly equal size, from a random sample."""
+    sample = collection.aggregate([
+        {"$sample": {"size": SAMPLE_SIZE}},
+        {"$match": {shard_key: {"$exists": True}}},
+        {"$project": {"_id": 0, "value": f"${shard_key}"}},
+    ])
+    values = sorted(doc["value"] for doc in sample)
+    if not values:
+        return []
+    step = len(values) / num_shards
+    return sorted({values[int(step * i)] for i in range(1, num_shards)})
+
+def shard_match(shard_key, low, high):
+    bounds = {}
+    if low is not None:
+        bounds["$gte"] = low
+    if high is not None:
+        bounds["$lt"] = high
+    return {"$match": {shard_key: bounds}} if bounds else {"$match": {}}
+
+def load_state(state_file):
+    if os.path.exists(state_file):
+        with open(state_file, 'r') as f:
+            return json_util.loads(f.read())
+    return None
+
+def save_state(state_file, state):
+    tmp_file = state_file + ".tmp"
+    with open(tmp_file, 'w') as f:
+        f.write(json_util.dumps(state))
+    os.replace(tmp_file, state_file)
+
+def group_fields(pipeline):
+    """Output fields and accumulators of the pipeline's final $group stage."""
+    group = pipeline[-1].get("$group")
+    if group is None:
+        raise ValueError("combine=True needs a pipeline that ends with $group")
+    fields = {}
+    for field, accumulator in group.items():
+        if field == "_id":
+            continue
+        (operator, _), = accumulator.items()
+        if operator not in COMBINABLE:
+            raise ValueError(f"{field}: {operator} partial results can't be combined; use one of {sorted(COMBINABLE)}")
+        fields[field] = operator
+    return fields
+
+def run_sharded(collection_name, pipeline, output_name, shard_key="_id", combine=False,
+                num_shards=NUM_SHARDS, num_workers=NUM_WORKERS, name=None):
+    """Run an aggregation pipeline as concurrent shard_key range shards and $merge the results into output_name.
+
+    combine=False: the pipeline maps documents to documents (e.g. $addFields tagging), and each shard
+        $merges its output into output_name directly, matched on _id.
+    combine=True: the pipeline ends with a $group using $sum/$min/$max. Each shard $merges its partial
+        groups into a staging collection keyed by (group key, shard); once every shard is done they
+        are grouped again into output_name, which is replaced.
+
+    Shards that finished are recorded in STATE_DIR/<name>.json together with the shard boundaries, so
+    after a failure running the same call again only re-runs the failed shards. Documents without
+    shard_key are not in any shard, so use _id unless every document has the field.
+    """
+    db = get_db()
+    collection = db[collection_name]
+    name = name or f"{collection_name}_to_{output_name}"
+    staging_name = f"{output_name}_shards"
+    os.makedirs(STATE_DIR, exist_ok=True)
+    state_file = os.path.join(STATE_DIR, f"{name}.json")
+    fields = group_fields(pipeline) if combine else None
+
+    state = load_state(state_file)
+    if state is None:
+        bounds = shard_bounds(collection, shard_key, num_shards)
+        state = {"shard_key": shard_key, "bounds": bounds, "done": []}
+        if combine:
+            db[staging_name].drop()
+        save_state(state_file, state)
+    else:
+        print(f"Resuming {name}: {len(state['done'])} of {len(state['bounds']) + 1} shards already done")
+
+    edges = [None] + state["bounds"] + [None]
+    shards = [(i, edges[i], edges[i + 1]) for i in range(len(edges) - 1)]
+    pending = [shard for shard in shards if shard[0] not in state["done"]]
+    state_lock = threading.Lock()
+
+    def run_shard(shard_id, low, high):
+        start = time.perf_counter()
+        shard_pipeline = [shard_match(state["shard_key"], low, high)] + pipeline
+        if combine:
+            shard_pipeline += [
+                {"$set": {"_id": {"key": "$_id", "shard": shard_id}}},
+                {"$merge": {"into": staging_name, "whenMatched": "replace"}},
+            ]
+        else:
+            shard_pipeline += [{"$merge": {"into": output_name, "on": "_id", "whenMatched": "replace"}}]
+        collection.aggregate(shard_pipeline, allowDiskUse=True)
+        return shard_id, time.perf_counter() - start
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=num_workers) as executor, \
+            tqdm(total=len(shards), initial=len(shards) - len(pending), desc=name, unit=" shards") as pbar:
+        futures = {executor.submit(run_shard, *shard): shard for shard in pending}
+        for future in as_completed(futures):
+            shard_id, low, high = futures[future]
+            try:
+                _, elapsed = future.result()
+            except Exception as e:
+                failed.append(shard_id)
+                tqdm.write(f"Shard {shard_id} [{low}, {high}) failed: {e}")
+                continue
+            with state_lock:
+                state["done"].append(shard_id)
+                save_state(state_file, state)
+            tqdm.write(f"Shard {shard_id} [{low}, {high}) done in {elapsed:.1f}s")
+            pbar.update(1)
+
+    if failed:
+        raise RuntimeError(f"{len(failed)} shards failed ({sorted(failed)}); run again to retry only those")
+
+    if combine:
+        db[output_name].drop()
+        db[staging_name].aggregate([
+            {"$group": {"_id": "$_id.key", **{field: {operator: f"${field}"} for field, operator in fields.items()}}},
+            {"$merge": {"into": output_name, "whenMatched": "replace"}},
+        ], allowDiskUse=True)
+        db[staging_name].drop()
+    os.remove(state_file)
+    print(f"{name}: {len(shards)} shards merged into {output_name}")
@@ -0,0 +1,137 @@
+import argparse
+import os
+import socket
+import threading
+from datetime import datetime, timedelta, timezone
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from reddit_db import get_db
+from shard_runner import shard_bounds, shard_match
+
+# Constants
+JOBS_COLLECTION = "work_jobs"  # One document per job with its _id range boundaries
+LEASES_COLLECTION = "work_leases"  # One document per range: pending, leased (owner + heartbeat) or done
+NUM_RANGES = 256  # Many more ranges than workers, so a reclaimed range is little repeated work
+HEARTBEAT_INTERVAL = 30  # Seconds between heartbeats of a leased range
+LEASE_TIMEOUT = 300  # Seconds without a heartbeat after which a range is handed to another worker
+
+def now():
+    return datetime.now(timezone.utc)
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def create_job(collection, job, num_ranges=NUM_RANGES):
+    """Split collection into _id ranges to lease out under the name job; an unfinished job is kept as is.
+
+    The boundaries are stored once in JOBS_COLLECTION (the first caller wins), so concurrent callers
+    can't create overlapping ranges from different samples.
+    """
+    db = get_db()
+    try:
+        db[JOBS_COLLECTION].insert_one({"_id": job, "collection": collection.name, "bounds": shard_bounds(collection, "_id", num_ranges), "created": now()})
+    except DuplicateKeyError:
+        pass
+    bounds = db[JOBS_COLLECTION].find_one({"_id": job})["bounds"]
+    edges = [None] + bounds + [None]
+    leases = db[LEASES_COLLECTION]
+    leases.create_index([("job", ASCENDING), ("state", ASCENDING), ("heartbeat", ASCENDING)])
+    try:
+        leases.insert_many([
+            {"_id": f"{job}:{i}", "job": job, "low": edges[i], "high": edges[i + 1], "state": "pending", "attempts": 0}
+            for i in range(len(edges) - 1)
+        ], ordered=False)
+    except BulkWriteError:
+        pass  # Ranges of a job that is being resumed already exist
+    counts = job_status(job)
+    print(f"Job {job}: {len(edges) - 1} ranges, {counts.get('done', 0)} already done")
+
+def job_status(job):
+    pipeline = [{"$match": {"job": job}}, {"$group": {"_id": "$state", "count": {"$sum": 1}}}]
+    return {doc["_id"]: doc["count"] for doc in get_db()[LEASES_COLLECTION].aggregate(pipeline)}
+
+def finish_job(job):
+    """Drop the job once every range is done, so the next run starts over with new boundaries."""
+    counts = job_status(job)
+    remaining = sum(count for state, count in counts.items() if state != "done")
+    if remaining:
+        print(f"Job {job}: {remaining} ranges not done; run again to resume them")
+        return False
+    db = get_db()
+    db[LEASES_COLLECTION].delete_many({"job": job})
+    db[JOBS_COLLECTION].delete_one({"_id": job})
+    print(f"Job {job}: all ranges done")
+    return True
+
+def acquire(job, owner):
+    """Lease a pending range, or one whose owner stopped sending heartbeats."""
+    expired = now() - timedelta(seconds=LEASE_TIMEOUT)
+    lease = get_db()[LEASES_COLLECTION].find_one_and_update(
+        {"job": job, "$or": [{"state": "pending"}, {"state": "leased", "heartbeat": {"$lt": expired}}]},
+        {"$set": {"state": "leased", "owner": owner, "heartbeat": now()}, "$inc": {"attempts": 1}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if lease is not None and lease["attempts"] > 1:
+        print(f"{owner}: reclaimed range {lease['_id']} (attempt {lease['attempts']})")
+    return lease
+
+def heartbeat(lease, owner):
+    """Extend the lease; False if it expired and was reclaimed by another worker."""
+    result = get_db()[LEASES_COLLECTION].update_one({"_id": lease["_id"], "owner": owner, "state": "leased"}, {"$set": {"heartbeat": now()}})
+    return result.matched_count == 1
+
+def complete(lease, owner):
+    result = get_db()[LEASES_COLLECTION].update_one({"_id": lease["_id"], "owner": owner}, {"$set": {"state": "done", "finished": now()}})
+    return result.matched_count == 1
+
+def range_filter(low, high):
+    return shard_match("_id", low, high)["$match"]
+
+def leased_ranges(job, owner=None):
+    """Yield _id range filters of job, one leased range at a time, until none is left.
+
+    A background thread sends heartbeats while the caller works on a range. The range is marked done
+    when the caller asks for the next one. If the worker dies the heartbeats stop, and after
+    LEASE_TIMEOUT the range goes to another worker. Work on a range must therefore be safe to repeat,
+    e.g. by querying only documents without the output field.
+    """
+    owner = owner or worker_name()
+    while True:
+        lease = acquire(job, owner)
+        if lease is None:
+            return
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(HEARTBEAT_INTERVAL):
+                if not heartbeat(lease, owner):
+                    print(f"{owner}: lost the lease on {lease['_id']}")
+                    return
+
+        thread = threading.Thread(target=beat, daemon=True)
+        thread.start()
+        try:
+            yield range_filter(lease["low"], lease["high"])
+        finally:
+            stop.set()
+            thread.join()
+        complete(lease, owner)
+
+def main():
+    parser = argparse.ArgumentParser(description="Show or reset the _id range leases of a job")
+    parser.add_argument("job", nargs="?")
+    parser.add_argument("--reset", action="store_true", help="Drop the job and its leases, so the next run starts over")
+    args = parser.parse_args()
+
+    db = get_db()
+    jobs = [args.job] if args.job else [doc["_id"] for doc in db[JOBS_COLLECTION].find({}, {"_id": 1})]
+    for job in jobs:
+        if args.reset:
+            db[LEASES_COLLECTION].delete_many({"job": job})
+            db[JOBS_COLLECTION].delete_one({"_id": job})
+            print(f"Job {job}: reset")
+        else:
+            print(f"Job {job}: {job_status(job)}")
+
+if __name__ == "__main__":
+    main()